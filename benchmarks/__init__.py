@@ -0,0 +1 @@
+"""Бенчмарки календаря и сетки на синтетических таблицах (python -m benchmarks.run)"""
@@ -0,0 +1,137 @@
+import calendar
+import random
+import threading
+import time
+from typing import Dict, List
+
+from gspread.utils import fill_gaps
+
+MONTH_TITLES = [
+    'ЯНВАРЬ', 'ФЕВРАЛЬ', 'МАРТ', 'АПРЕЛЬ', 'МАЙ', 'ИЮНЬ',
+    'ИЮЛЬ', 'АВГУСТ', 'СЕНТЯБРЬ', 'ОКТЯБРЬ', 'НОЯБРЬ', 'ДЕКАБРЬ'
+]
+WEEKDAY_TITLES = ['ПОНЕДЕЛЬНИК', 'ВТОРНИК', 'СРЕДА', 'ЧЕТВЕРГ', 'ПЯТНИЦА', 'СУББОТА ', 'ВОСКРЕСЕНЬЕ']
+GRID_DAYS = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
+ACTIVITIES = [
+    'завтрак', 'обед', 'ужин', 'отбой', 'сбор', 'на погрузке', 'разгружаем газель',
+    'дежурство на входе', 'репетиция', 'свободен', 'мастер-класс', 'едет на площадку'
+]
+FIRST_NAMES = ['Анна', 'Милана', 'Пётр', 'Иван', 'Мария', 'Алексей', 'Ольга', 'Дмитрий']
+
+
+def make_calendar(months: int = 12, projects: int = 200, year: int = 2025,
+                  seed: int = 1) -> List[List[str]]:
+    """
+    Лист календаря в формате, который разбирает parse_calendar_data
+
+    Каждый месяц: строка с названием, строка дней недели, затем для каждой
+    недели строка с числами и по строке на каждый проект.
+    """
+    rnd = random.Random(seed)
+    project_names = [f"Проект {i}" for i in range(projects)]
+    rows = []
+    for month in range(1, months + 1):
+        rows.append([MONTH_TITLES[month - 1]] + [''] * 7)
+        rows.append([''] + WEEKDAY_TITLES)
+        for week in calendar.Calendar().monthdayscalendar(year, month):
+            rows.append([''] + [str(day) if day else '' for day in week])
+            for project in project_names:
+                row = [project]
+                for _ in week:
+                    value = rnd.random()
+                    if value < 0.6:
+                        row.append('')
+                    elif value < 0.8:
+                        row.append(rnd.choice(['сбор', 'концерт', 'выезд', 'репетиция']))
+                    elif value < 0.95:
+                        row.append(f"{project} + {rnd.choice(project_names)}")
+                    else:
+                        row.append(f"репетиция + {rnd.choice(project_names)}")
+                rows.append(row)
+    return rows
+
+
+def make_grid(organisers: int = 2000, slots: int = 48, days: int = 7,
+              seed: int = 1) -> Dict[str, List[List[str]]]:
+    """
+    Листы сетки: по листу на день, организаторы в строках, получасовые слоты в столбцах
+
+    Returns:
+        Словарь {название листа: значения}
+    """
+    rnd = random.Random(seed)
+    times = [f"{(9 + slot // 2) % 24}:{30 * (slot % 2):02d}" for slot in range(slots)]
+    names = [
+        f"Фамилия{i} {FIRST_NAMES[i % len(FIRST_NAMES)]}" for i in range(organisers)
+    ]
+    sheets = {}
+    for day in GRID_DAYS[:days]:
+        rows = [['Организатор', 'Телефон', 'Должность'] + times]
+        for name in names:
+            row = [name, f"8915{rnd.randint(1000000, 9999999)}", rnd.choice(['орг', 'координатор'])]
+            activity = rnd.choice(ACTIVITIES)
+            for _ in times:
+                if rnd.random() < 0.3:
+                    activity = rnd.choice(ACTIVITIES)
+                row.append('' if rnd.random() < 0.05 else activity)
+            rows.append(row)
+        sheets[f"Сетка {day}"] = rows
+    return sheets
+
+
+class FakeWorksheet:
+    """Лист в памяти с интерфейсом gspread.Worksheet"""
+
+    def __init__(self, spreadsheet: 'FakeSpreadsheet', title: str, values: List[List[str]], id: int):
+        self._spreadsheet = spreadsheet
+        self.title = title
+        self.values = values
+        self.id = id
+
+    def get_all_values(self) -> List[List[str]]:
+        self._spreadsheet._call('values')
+        return fill_gaps([list(row) for row in self.values])
+
+
+class FakeSpreadsheet:
+    """Таблица в памяти вместо gspread.Spreadsheet; считает вызовы API
+
+    latency имитирует задержку сети на каждый вызов.
+    """
+
+    title = 'benchmark'
+
+    def __init__(self, sheets: Dict[str, List[List[str]]], latency: float = 0.0):
+        self.latency = latency
+        self.calls = {'meta': 0, 'values': 0}
+        self._lock = threading.Lock()
+        self._worksheets = [
+            FakeWorksheet(self, title, values, idx)
+            for idx, (title, values) in enumerate(sheets.items())
+        ]
+
+    def _call(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._call('meta')
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._call('meta')
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(title)
+
+    def values_batch_get(self, ranges: List[str], params=None) -> Dict:
+        self._call('values')
+        by_title = {worksheet.title: worksheet for worksheet in self._worksheets}
+        value_ranges = []
+        for range_name in ranges:
+            title = range_name[1:-1].replace("''", "'") if range_name.startswith("'") else range_name
+            value_ranges.append({'range': range_name, 'values': [list(row) for row in by_title[title].values]})
+        return {'valueRanges': value_ranges}
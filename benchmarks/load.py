@@ -0,0 +1,205 @@
+"""
+Нагрузочный тест: python -m benchmarks.load --workers 200 --requests 5000 --latency 0.3
+
+Много потоков одновременно запрашивают календарь и расписания сетки, как
+пользователи бота в начале фестиваля. Google Sheets заменен таблицами
+в памяти с задержкой на каждый вызов API.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import FakeSpreadsheet, make_calendar, make_grid
+from benchmarks.run import _git_revision
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float,
+             first_error: Optional[str] = None) -> Dict:
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'first_error': first_error,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def _make_queries(organisers: int, rnd: random.Random) -> List[tuple]:
+    """Смесь запросов к сетке: точные, по фамилии и имени, с опечаткой, отсутствующие"""
+    queries = []
+    for _ in range(1000):
+        i = rnd.randrange(organisers)
+        kind = rnd.random()
+        if kind < 0.6:
+            queries.append((f"Фамилия{i}", False))
+        elif kind < 0.8:
+            queries.append((f"фамилия{i} ", False))
+        elif kind < 0.95:
+            queries.append((f"Фамелия{i}", True))
+        else:
+            queries.append((f"Нетакого{i}", False))
+    return queries
+
+
+def run(workers: int, requests: int, latency: float, calendar_share: float,
+        organisers: int, refresh_seconds: float, seed: int) -> Dict:
+    """Запуск нагрузки и сбор статистики"""
+    import calendar_events.calendar as calendar_module
+    from config import WORKSHEET_NAME
+
+    calendar_sheet = FakeSpreadsheet({WORKSHEET_NAME: make_calendar(projects=30)}, latency=latency)
+    grid_sheet = FakeSpreadsheet(make_grid(organisers=organisers, days=4), latency=latency)
+
+    # Календарь получает таблицу через datasource.open_source - подменяем только
+    # эту функцию (остальной модуль нужен календарю как есть) и возвращаем после теста
+    datasource = calendar_module.datasource
+    original_open_source = datasource.open_source
+    datasource.open_source = lambda *args, **kwargs: calendar_sheet
+    try:
+        return _run(calendar_module, calendar_sheet, grid_sheet, workers, requests, latency,
+                    calendar_share, organisers, refresh_seconds, seed)
+    finally:
+        datasource.open_source = original_open_source
+
+
+def _run(calendar_module, calendar_sheet: FakeSpreadsheet, grid_sheet: FakeSpreadsheet,
+         workers: int, requests: int, latency: float, calendar_share: float,
+         organisers: int, refresh_seconds: float, seed: int) -> Dict:
+    from grid.grid import GridScheduler
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        calendar_module._REFRESHER.min_interval = min(calendar_module._REFRESHER.min_interval, refresh_seconds)
+        calendar_module._REFRESHER.max_interval = refresh_seconds
+
+        scheduler = GridScheduler(snapshot_ttl=refresh_seconds)
+        scheduler._refresher.min_interval = min(scheduler._refresher.min_interval, refresh_seconds)
+        scheduler.spreadsheet = grid_sheet
+        scheduler.days = scheduler._get_days_from_sheets()
+    # Справочник листов строится при подключении и не относится к трафику
+    grid_sheet.calls = {'meta': 0, 'values': 0}
+
+    rnd = random.Random(seed)
+    queries = _make_queries(organisers, rnd)
+    plan = [
+        ('calendar', None) if rnd.random() < calendar_share else ('grid', rnd.choice(queries))
+        for _ in range(requests)
+    ]
+
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {'calendar': [], 'grid': []}
+    errors = {'calendar': 0, 'grid': 0}
+    # Первая ошибка каждого вида запросов, чтобы поломка не пряталась за счетчиком
+    first_errors: Dict[str, str] = {}
+
+    def handle(item):
+        kind, query = item
+        start = time.perf_counter()
+        try:
+            if kind == 'calendar':
+                calendar_module.get(days_ahead=7)
+            else:
+                scheduler.get(query[0], fuzzy=query[1])
+            error = None
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[kind].append(elapsed)
+            if error is not None:
+                errors[kind] += 1
+                first_errors.setdefault(kind, f"{type(error).__name__}: {error}")
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(handle, plan))
+    elapsed = time.perf_counter() - started
+
+    upstream = {
+        'calendar': dict(calendar_sheet.calls),
+        'grid': dict(grid_sheet.calls),
+    }
+    total_calls = sum(sum(calls.values()) for calls in upstream.values())
+    return {
+        'revision': _git_revision(),
+        'params': {
+            'workers': workers, 'requests': requests, 'latency_s': latency,
+            'calendar_share': calendar_share, 'organisers': organisers,
+            'refresh_seconds': refresh_seconds, 'seed': seed,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'total': _summary(latencies['calendar'] + latencies['grid'],
+                          errors['calendar'] + errors['grid'], elapsed),
+        'calendar': _summary(latencies['calendar'], errors['calendar'], elapsed,
+                             first_errors.get('calendar')),
+        'grid': _summary(latencies['grid'], errors['grid'], elapsed, first_errors.get('grid')),
+        'upstream_calls': upstream,
+        'upstream_calls_per_request': round(total_calls / requests, 5) if requests else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест календаря и сетки")
+    parser.add_argument('--workers', type=int, default=100, help="Одновременных пользователей")
+    parser.add_argument('--requests', type=int, default=5000, help="Всего запросов")
+    parser.add_argument('--latency', type=float, default=0.2, help="Задержка одного вызова API в секундах")
+    parser.add_argument('--calendar-share', type=float, default=0.3, help="Доля запросов календаря")
+    parser.add_argument('--organisers', type=int, default=500, help="Организаторов в сетке")
+    parser.add_argument('--refresh-seconds', type=float, default=300,
+                        help="Возраст данных, после которого они обновляются в фоне")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Файл для результата в JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    # Холодный старт: без сохраненных на диске снимков (config читает
+    # SNAPSHOT_DIR при первом импорте, который происходит внутри run())
+    with tempfile.TemporaryDirectory(prefix='rim_load_') as snapshot_dir:
+        os.environ['SNAPSHOT_DIR'] = snapshot_dir
+        result = run(args.workers, args.requests, args.latency, args.calendar_share,
+                     args.organisers, args.refresh_seconds, args.seed)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    failed = False
+    for kind in ('calendar', 'grid'):
+        summary = result[kind]
+        if summary['first_error']:
+            print(f"{kind}: первая ошибка: {summary['first_error']}", file=sys.stderr)
+        if summary['requests'] and summary['errors'] == summary['requests']:
+            print(f"{kind}: все {summary['requests']} запросов завершились ошибкой", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
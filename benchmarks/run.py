@@ -0,0 +1,197 @@
+"""
+Запуск бенчмарков: python -m benchmarks.run [--size stress] [--output result.json]
+
+Данные генерируются с фиксированным seed, поэтому результаты разных коммитов
+сравнимы: python -m benchmarks.run --compare old.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import FakeSpreadsheet, make_calendar, make_grid
+
+SIZES = {
+    'realistic': {'months': 12, 'projects': 30, 'organisers': 300, 'slots': 48, 'days': 4},
+    'stress': {'months': 12, 'projects': 200, 'organisers': 2000, 'slots': 48, 'days': 7},
+}
+# Сколько запросов к сетке выполняется в одном замере
+GRID_QUERIES = 200
+
+
+def _git_revision() -> str:
+    """Текущий коммит; с пометкой -dirty, если есть незакоммиченные изменения"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=current_dir,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=current_dir,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{revision}-dirty" if dirty else revision
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Время (минимум и медиана по повторам) и пиковая память одного запуска"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    # Память меряется отдельным запуском: tracemalloc замедляет код
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def _calendar_benchmarks(size: Dict[str, int]) -> Dict[str, Callable[[], object]]:
+    from calendar_events.calendar import format_calendar_output, parse_calendar_data
+
+    rows = make_calendar(months=size['months'], projects=size['projects'])
+    events = parse_calendar_data(rows)
+    target = datetime.date(2025, 3, 3)
+    return {
+        'calendar.parse': lambda: parse_calendar_data(rows),
+        'calendar.format_week': lambda: format_calendar_output(events, target_date=target, days_ahead=7),
+        'calendar.format_year': lambda: format_calendar_output(events, target_date=datetime.date(2025, 1, 1),
+                                                               days_ahead=365),
+    }
+
+
+def _grid_benchmarks(size: Dict[str, int]) -> Dict[str, Callable[[], object]]:
+    from grid.grid import GridScheduler
+
+    sheets = make_grid(organisers=size['organisers'], slots=size['slots'], days=size['days'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        scheduler.refresh()
+
+    step = max(size['organisers'] // GRID_QUERIES, 1)
+    queries = [f"Фамилия{i} " for i in range(0, size['organisers'], step)][:GRID_QUERIES]
+    found = [scheduler.search_person(query) for query in queries]
+
+    # Две версии таблицы по очереди: иначе обновление не увидит изменений и ничего не разберет
+    variants = itertools.cycle([
+        FakeSpreadsheet(make_grid(organisers=size['organisers'], slots=size['slots'],
+                                  days=size['days'], seed=seed))
+        for seed in (2, 1)
+    ])
+
+    def refresh():
+        scheduler.spreadsheet = next(variants)
+        scheduler.refresh()
+
+    return {
+        'grid.refresh': refresh,
+        'grid.search': lambda: [scheduler.search_person(query) for query in queries],
+        'grid.format': lambda: [scheduler.format_schedule_for_bot(data) for data in found if data],
+        'grid.get': lambda: [scheduler.get(query) for query in queries],
+        'grid.get_many': lambda: scheduler.search_people(queries),
+        'grid.get_fuzzy_miss': lambda: [scheduler.get(f"Фамелия{query[7:]}", fuzzy=True)
+                                        for query in queries[:20]],
+    }
+
+
+def run(size_name: str, repeat: int, only: List[str] = None) -> Dict:
+    """Запуск всех бенчмарков и сбор результата"""
+    size = SIZES[size_name]
+    benchmarks = {}
+    benchmarks.update(_calendar_benchmarks(size))
+    benchmarks.update(_grid_benchmarks(size))
+
+    results = {}
+    for name, func in benchmarks.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = _measure(func, repeat)
+        print(f"{name:24} {results[name]['median_ms']:>10.2f} ms {results[name]['peak_kib']:>12.1f} KiB",
+              file=sys.stderr)
+
+    return {
+        'revision': _git_revision(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'size': size_name,
+        'params': size,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(old: Dict, new: Dict) -> List[str]:
+    """Сравнение медиан двух запусков"""
+    lines = [f"{old.get('revision')} -> {new.get('revision')} ({new.get('size')})"]
+    if old.get('params') != new.get('params'):
+        lines.append("Внимание: размеры данных в запусках различаются")
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            lines.append(f"{name:24} новый")
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        lines.append(f"{name:24} {before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms  x{ratio:.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки календаря и сетки")
+    parser.add_argument('--size', choices=sorted(SIZES), default='realistic')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help="Префиксы имен бенчмарков (calendar, grid.get...)")
+    parser.add_argument('--output', help="Файл для результата в JSON (по умолчанию stdout)")
+    parser.add_argument('--compare', help="Результат прошлого запуска для сравнения")
+    args = parser.parse_args()
+
+    # Снимки на диске не должны влиять на замеры; config читает SNAPSHOT_DIR
+    # при первом импорте, который происходит внутри run()
+    with tempfile.TemporaryDirectory(prefix='rim_bench_') as snapshot_dir:
+        os.environ['SNAPSHOT_DIR'] = snapshot_dir
+        result = run(args.size, args.repeat, args.only)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print('\n'.join(compare(json.load(f), result)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
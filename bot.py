@@ -15,10 +15,12 @@ load_dotenv()
 
 def main():
     # Импортируем модули после настройки sys.path
-    from calendar_events import get as get_calendar
+    from calendar_events import get as get_calendar, restore_snapshot
     from grid import init_scheduler
     
     print("=== Запуск rim_bot ===")
+    # Сохраненный календарь подставляется до первого запроса
+    restore_snapshot()
     print("Получение календаря...")
     calendar_data = get_calendar(days_ahead=7, force_refresh=False)
     print(calendar_data)
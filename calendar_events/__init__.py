@@ -1 +1 @@
-from .calendar import get
\ No newline at end of file
+from .calendar import get, get_range, restore_snapshot
@@ -1,27 +1,162 @@
+import atexit
 import datetime
-import gspread
-from collections import defaultdict
+import multiprocessing
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import os
 import sys
+import threading
 from pathlib import Path
 
+from gspread.utils import absolute_range_name, fill_gaps
+
 # Добавляем родительскую директорию в sys.path если её нет
 current_dir = Path(__file__).parent.parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
 from config import (
-    CREDS_FILE, CALENDAR_URL as URL, WORKSHEET_NAME, CACHE_DURATION_HOURS,
+    CREDS_FILE, CALENDAR_URL as URL, CALENDAR_LOCAL_PATH,
+    CALENDAR_START_YEAR, CALENDAR_WORKSHEETS, CALENDAR_PARSE_WORKERS,
+    CALENDAR_MIN_REFRESH_SECONDS, CALENDAR_MAX_REFRESH_SECONDS, CALENDAR_RENDER_CACHE_SIZE,
     MONTHS, WEEKDAYS, MONTH_NAMES
 )
+from common import datasource, metrics, store
+from common.refresher import BackgroundRefresher
+
+# Слова, при наличии которых событие с "+" не считается комбинацией проектов
+COMBINATION_STOP_WORDS = ('репетиция', 'собрание', 'концепции')
+
+class _ProjectMatcher:
+    """Автомат Ахо-Корасик по названиям проектов в нижнем регистре"""
+    
+    def __init__(self, projects):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [frozenset()]
+        
+        # Бор из названий проектов
+        for project in {project.lower() for project in projects}:
+            state = 0
+            for char in project:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                state = next_state
+            self._out[state] = self._out[state] | {project}
+        
+        # Суффиксные ссылки обходом в ширину
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] = self._out[next_state] | self._out[fail]
+                queue.append(next_state)
+    
+    def contains_other(self, text: str, project: str) -> bool:
+        """Есть ли в тексте (в нижнем регистре) название проекта, отличного от project"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for found in out[state]:
+                if found != project:
+                    return True
+        return False
 
-# Кеш для данных
-_CACHED_EVENTS = None
-_CACHE_TIMESTAMP = None
+class CalendarData(defaultdict):
+    """События по датам (как defaultdict(list)) с индексами для выборок по диапазону
+    
+    После finalize() события каждого дня отсортированы, dates - отсортированный
+    список дат с событиями, а projects хранит события каждого проекта по датам.
+    """
+    
+    def __init__(self, events=None, projects=None):
+        """
+        Args:
+            events: Словарь {дата: [события]}
+            projects: Словарь {проект в нижнем регистре: [(дата, событие)]}
+        """
+        super().__init__(list, events or {})
+        self.projects = projects or {}
+        self.dates = []
+        self._project_dates = {}
+        self.presorted = False
+    
+    def add_project_event(self, project, date, event):
+        """Запоминание события в индексе проекта"""
+        self.projects.setdefault(project.lower(), []).append((date, event))
+    
+    def finalize(self):
+        """Сортировка событий дней и построение индексов дат"""
+        for events in self.values():
+            events.sort()
+        self.dates = sorted(date for date, events in self.items() if events)
+        self._project_dates = {}
+        for project, entries in self.projects.items():
+            # Одно событие может попасть в индекс проекта несколько раз
+            # (одинаковые ячейки в строках разных проектов)
+            entries = self.projects[project] = sorted(dict.fromkeys(entries))
+            self._project_dates[project] = [date for date, _ in entries]
+        self.presorted = True
+        return self
+    
+    def get_range(self, start, end, project=None):
+        """
+        События в диапазоне дат [start, end)
+        
+        Args:
+            start: Первая дата
+            end: Дата, следующая за последней
+            project: Только события этого проекта (без учета регистра)
+            
+        Returns:
+            Список (дата, [события]) по возрастанию дат; списки событий - копии,
+            их изменение не затрагивает данные календаря
+        """
+        if project is None:
+            first = bisect_left(self.dates, start)
+            last = bisect_left(self.dates, end)
+            return [(date, list(self[date])) for date in self.dates[first:last]]
+        
+        key = project.strip().lower()
+        dates = self._project_dates.get(key, [])
+        entries = self.projects.get(key, [])
+        result = []
+        for idx in range(bisect_left(dates, start), bisect_left(dates, end)):
+            date, event = entries[idx]
+            if result and result[-1][0] == date:
+                result[-1][1].append(event)
+            else:
+                result.append((date, [event]))
+        return result
 
-def parse_calendar_data(data):
-    """Парсинг двухмерного массива календаря"""
-    events_by_date = defaultdict(list)
-    current_year = 2025
+def parse_calendar_data(data, start_year=CALENDAR_START_YEAR):
+    """
+    Парсинг двухмерного массива календаря
+    
+    Args:
+        data: Значения листа
+        start_year: Год первого месяца листа; если номер следующего месяца
+            меньше предыдущего (декабрь -> январь), год увеличивается
+    """
+    return _collect_events(data, start_year).finalize()
+
+def _collect_events(data, start_year):
+    """События листа без сортировки и индексов дат (их строит finalize())"""
+    events_by_date = CalendarData()
+    current_year = start_year
     current_month = None
     week_dates = [None] * 7
     
@@ -39,6 +174,9 @@ def parse_calendar_data(data):
             not project_name.isdigit()):
             all_projects.add(project_name)
     
+    # Один проход по тексту ячейки находит все упомянутые в ней проекты
+    project_matcher = _ProjectMatcher(all_projects)
+    
     # Теперь парсим события
     for row_idx, row in enumerate(data):
         if not row or len(row) < 8:
@@ -46,6 +184,8 @@ def parse_calendar_data(data):
             
         # Проверка на месяц
         if row[0] in MONTHS:
+            if current_month is not None and MONTHS[row[0]] < current_month:
+                current_year += 1
             current_month = MONTHS[row[0]]
             continue
             
@@ -83,14 +223,12 @@ def parse_calendar_data(data):
                         # Событие является комбинацией если содержит "+" И содержит название другого проекта
                         is_project_combination = False
                         if "+" in event_text:
+                            event_lower = event_text.lower()
                             # Проверяем, содержит ли событие название проекта, отличного от текущего
-                            for project in all_projects:
-                                if (project.lower() in event_text.lower() and 
-                                    project.lower() != project_name.lower() and
-                                    not any(keyword.lower() in event_text.lower() 
-                                           for keyword in ['репетиция', 'собрание', 'концепции'])):
-                                    is_project_combination = True
-                                    break
+                            if not any(keyword in event_lower for keyword in COMBINATION_STOP_WORDS):
+                                is_project_combination = project_matcher.contains_other(
+                                    event_lower, project_name.lower()
+                                )
                         
                         if is_project_combination:
                             # Комбинация проектов добавляется без префикса проекта
@@ -102,6 +240,7 @@ def parse_calendar_data(data):
                         # Добавляем событие только если его еще нет
                         if event_to_add not in events_by_date[date]:
                             events_by_date[date].append(event_to_add)
+                        events_by_date.add_project_event(project_name, date, event_to_add)
                         
                         # Проверяем объединенные ячейки - распространяем на все пустые ячейки справа
                         if is_project_combination:
@@ -114,6 +253,7 @@ def parse_calendar_data(data):
                                         next_date = datetime.date(current_year, current_month, week_dates[next_day_idx])
                                         if event_to_add not in events_by_date[next_date]:
                                             events_by_date[next_date].append(event_to_add)
+                                        events_by_date.add_project_event(project_name, next_date, event_to_add)
                                     else:
                                         # Если встретили непустую ячейку, прекращаем распространение
                                         break
@@ -147,8 +287,11 @@ def format_calendar_output(events_by_date, target_date=None, days_ahead=7, times
         
         # События дня
         if current_date in events_by_date:
-            # Сортируем события по алфавиту
-            sorted_events = sorted(events_by_date[current_date])
+            # Сортируем события по алфавиту (разобранный календарь уже отсортирован)
+            if getattr(events_by_date, 'presorted', False):
+                sorted_events = events_by_date[current_date]
+            else:
+                sorted_events = sorted(events_by_date[current_date])
             for event in sorted_events:
                 output_lines.append(f"- {event}")
         else:
@@ -159,46 +302,321 @@ def format_calendar_output(events_by_date, target_date=None, days_ahead=7, times
         output_lines.append(f"Календарь обновлен: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
     return "\n".join(output_lines)
 
-def is_cache_valid():
-    """Проверка актуальности кеша"""
-    global _CACHE_TIMESTAMP
-    if _CACHED_EVENTS is None or _CACHE_TIMESTAMP is None:
-        return False
+def merge_calendars(parts):
+    """
+    Объединение календарей нескольких листов в один
     
-    now = datetime.datetime.now()
-    cache_age = now - _CACHE_TIMESTAMP
-    return cache_age.total_seconds() < CACHE_DURATION_HOURS * 3600
+    Порядок событий не зависит от порядка завершения разбора: события
+    каждого дня и каждого проекта сортируются в finalize().
+    """
+    merged = CalendarData()
+    for part in parts:
+        for date, events in part.items():
+            day_events = merged[date]
+            for event in events:
+                if event not in day_events:
+                    day_events.append(event)
+        for project, entries in part.projects.items():
+            merged.projects.setdefault(project, []).extend(entries)
+    projects = dict(sorted(merged.projects.items()))
+    return CalendarData({date: merged[date] for date in sorted(merged)}, projects).finalize()
 
-def get_events_data(force_refresh=False):
-    """Получение данных событий с кешированием"""
-    global _CACHED_EVENTS, _CACHE_TIMESTAMP
+def _parse_worksheet(args):
+    """
+    Разбор одного листа (выполняется в процессе пула)
     
-    # Проверяем кеш если не требуется принудительное обновление
-    if not force_refresh and is_cache_valid():
-        print("Используются кешированные данные")
-        return _CACHED_EVENTS, _CACHE_TIMESTAMP
+    Returns:
+        (события по датам, индекс проектов) - обычные словари: сортировка
+        и индексы дат строятся один раз в родительском процессе после объединения
+    """
+    values, start_year = args
+    events_by_date = _collect_events(values, start_year)
+    return dict(events_by_date), events_by_date.projects
+
+def _year_span(values, start_year):
+    """
+    Месяцы листа так, как их считает parse_calendar_data
+    
+    Returns:
+        (номер первого месяца, год и номер последнего месяца) или None, если месяцев нет
+    """
+    year = start_year
+    first = last = None
+    for row in values:
+        if not row or len(row) < 8 or row[0] not in MONTHS:
+            continue
+        month = MONTHS[row[0]]
+        if last is not None and month < last:
+            year += 1
+        if first is None:
+            first = month
+        last = month
+    if first is None:
+        return None
+    return first, year, last
+
+def _start_years(worksheets, sheet_values):
+    """
+    Год начала каждого листа
     
+    Лист без явного года продолжает предыдущий: начинается тем же годом,
+    которым тот закончился, или следующим, если его первый месяц раньше
+    последнего месяца предыдущего листа.
+    
+    Args:
+        worksheets: Список (название, год или None)
+        sheet_values: Значения листов в том же порядке
+    """
+    years = []
+    year, last_month = CALENDAR_START_YEAR, None
+    for (_, explicit_year), values in zip(worksheets, sheet_values):
+        start_year = year if explicit_year is None else explicit_year
+        span = _year_span(values, start_year)
+        if span is not None:
+            first_month, end_year, end_month = span
+            if explicit_year is None and last_month is not None and first_month < last_month:
+                start_year += 1
+                end_year += 1
+            year, last_month = end_year, end_month
+        else:
+            year = start_year
+        years.append(start_year)
+    return years
+
+def _get_parse_pool():
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            # Пул создается из потока обновления многопоточного процесса: fork
+            # скопировал бы блокировки, захваченные другими потоками
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=CALENDAR_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context(method)
+            )
+        return _PARSE_POOL
+
+def _shutdown_parse_pool():
+    """Остановка пула процессов разбора (при ошибке пула и при выходе)"""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        pool, _PARSE_POOL = _PARSE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _parse_worksheets(jobs):
+    """
+    Разбор нескольких листов; больше одного листа разбирается параллельно в процессах
+    
+    Args:
+        jobs: Список (значения листа, год начала)
+        
+    Returns:
+        Список CalendarData без finalize() в том же порядке
+    """
+    results = None
+    if len(jobs) > 1:
+        try:
+            results = list(_get_parse_pool().map(_parse_worksheet, jobs))
+        except Exception as e:
+            print(f"Ошибка параллельного разбора календаря: {e}, разбираем последовательно")
+            _shutdown_parse_pool()
+    if results is None:
+        results = [_parse_worksheet(job) for job in jobs]
+    return [CalendarData(events, projects) for events, projects in results]
+
+def _fetch_worksheets(spreadsheet, titles):
+    """Значения всех листов календаря одним запросом values:batchGet"""
+    response = spreadsheet.values_batch_get([absolute_range_name(title) for title in titles])
+    value_ranges = response.get('valueRanges', [])
+    if len(value_ranges) != len(titles):
+        raise RuntimeError(f"Получено {len(value_ranges)} листов календаря из {len(titles)}")
+    # Как worksheet.get_all_values: строки дополняются до одной длины
+    return [fill_gaps(value_range.get('values', [])) for value_range in value_ranges]
+
+def _load_events():
+    """Загрузка и парсинг календаря из Google Sheets"""
     print("Загружаются данные из Google Sheets...")
-    # Получаем данные из Google Sheets
-    gc = gspread.service_account(filename=CREDS_FILE)
-    sh = gc.open_by_url(URL)
+    global _SOURCE_SIGNATURE
+    titles = [title for title, _ in CALENDAR_WORKSHEETS]
+    signature = datasource.local_signature(CALENDAR_LOCAL_PATH)
+    with metrics.stage('calendar.fetch'):
+        sh = datasource.open_source(URL, CREDS_FILE, CALENDAR_LOCAL_PATH)
+        sheet_values = _fetch_worksheets(sh, titles)
+    _SOURCE_SIGNATURE = signature
     
-    # Используем только основной лист
-    worksheet = sh.worksheet(WORKSHEET_NAME)
-    sheet_data = worksheet.get_all_values()
-    events_by_date = parse_calendar_data(sheet_data)
+    # Листы, не менявшиеся с прошлой загрузки, повторно не разбираются
+    global _LAST_PARSED
+    start_years = _start_years(CALENDAR_WORKSHEETS, sheet_values)
+    # Год начала входит в отпечаток: тот же лист с другим годом разбирается заново
+    fingerprints = [
+        store.fingerprint([start_year, values])
+        for start_year, values in zip(start_years, sheet_values)
+    ]
+    if _LAST_PARSED is not None and _LAST_PARSED[0] == fingerprints:
+        print("Календарь не изменился, разбор пропущен")
+        metrics.inc('rim_parse_skipped_total', source='calendar')
+        return _LAST_PARSED[2]
     
-    # Обновляем кеш
-    _CACHED_EVENTS = events_by_date
-    _CACHE_TIMESTAMP = datetime.datetime.now()
+    previous = {}
+    if _LAST_PARSED is not None:
+        previous = dict(zip(_LAST_PARSED[0], _LAST_PARSED[1]))
+    jobs = [
+        (values, start_year)
+        for start_year, values, fingerprint in zip(start_years, sheet_values, fingerprints)
+        if fingerprint not in previous
+    ]
+    with metrics.stage('calendar.parse'):
+        parsed = iter(_parse_worksheets(jobs))
+        parts = [
+            previous[fingerprint] if fingerprint in previous else next(parsed)
+            for fingerprint in fingerprints
+        ]
+        # Сортировка и индексы дат строятся один раз, для итогового календаря
+        events_by_date = parts[0].finalize() if len(parts) == 1 else merge_calendars(parts)
+    _LAST_PARSED = (fingerprints, parts, events_by_date)
     
-    return events_by_date, _CACHE_TIMESTAMP
+    # Сохраняем снимок для быстрого старта следующего процесса
+    store.save('calendar', {
+        'events': {date.isoformat(): events for date, events in events_by_date.items()},
+        'projects': {
+            project: [[date.isoformat(), event] for date, event in entries]
+            for project, entries in events_by_date.projects.items()
+        },
+    }, source=_snapshot_source())
+    return events_by_date
+
+def _snapshot_source():
+    """Таблица и листы календаря: снимок с другими настройками при старте не используется"""
+    source = {'local_path': os.path.abspath(CALENDAR_LOCAL_PATH)} if CALENDAR_LOCAL_PATH else {'url': URL}
+    source['worksheets'] = [[title, start_year] for title, start_year in CALENDAR_WORKSHEETS]
+    return source
+
+def _local_source_changed():
+    """Изменились ли файлы локальной копии календаря с последней загрузки"""
+    if not CALENDAR_LOCAL_PATH:
+        return False
+    return datasource.local_signature(CALENDAR_LOCAL_PATH) != _SOURCE_SIGNATURE
+
+def restore_snapshot():
+    """
+    Подстановка сохраненного на диске календаря до первой загрузки
+
+    Вызывается при старте процесса (бот, демон); get_events_data() вызывает
+    ее сам, если старт этого не сделал. Испорченный снимок пропускается -
+    календарь тогда загружается из таблицы.
+    """
+    global _RESTORED
+    with _RESTORE_LOCK:
+        if _RESTORED:
+            return
+        try:
+            restored = store.load('calendar', _snapshot_source())
+            if restored is not None:
+                payload, timestamp = restored
+                events_by_date = CalendarData(
+                    {datetime.date.fromisoformat(date): events for date, events in payload['events'].items()},
+                    {
+                        project: [(datetime.date.fromisoformat(date), event) for date, event in entries]
+                        for project, entries in payload['projects'].items()
+                    }
+                ).finalize()
+                if _REFRESHER.seed(events_by_date, timestamp):
+                    print(f"Календарь загружен с диска (обновлен {timestamp.strftime('%Y-%m-%d %H:%M:%S')})")
+        except Exception as e:
+            print(f"Ошибка разбора сохраненного снимка календаря: {e}")
+        _RESTORED = True
+
+# Кеш для данных: отдает прошлые события, пока один фоновый поток загружает новые
+_REFRESHER = BackgroundRefresher(
+    _load_events,
+    min_interval=CALENDAR_MIN_REFRESH_SECONDS,
+    max_interval=CALENDAR_MAX_REFRESH_SECONDS,
+    name='календарь',
+    changed=_local_source_changed
+)
+# Состояние файлов локальной копии при последней загрузке
+_SOURCE_SIGNATURE = None
+_RESTORED = False
+_RESTORE_LOCK = threading.Lock()
+# Последний разбор: (отпечатки листов, календари листов, объединенный календарь)
+_LAST_PARSED = None
+# Пул процессов для разбора листов, создается при первой необходимости
+_PARSE_POOL = None
+_PARSE_POOL_LOCK = threading.Lock()
+atexit.register(_shutdown_parse_pool)
+# Готовые тексты: (дата начала, дней вперед, время загрузки данных) -> текст
+_RENDERED = OrderedDict()
+_RENDERED_TIMESTAMP = None
+_RENDERED_LOCK = threading.Lock()
+
+def is_cache_valid():
+    """Проверка актуальности кеша"""
+    return _REFRESHER.is_fresh()
+
+def get_refresh_status():
+    """Состояние кеша календаря: возраст данных и последняя ошибка"""
+    return _REFRESHER.status()
+
+def get_events_data(force_refresh=False):
+    """Получение данных событий с кешированием"""
+    if not _RESTORED:
+        restore_snapshot()
+    return _REFRESHER.get(force_refresh=force_refresh)
 
 def get(days_ahead: int = 7, force_refresh: bool = False) -> str:
-    # Получаем данные (из кеша или Google Sheets)
-    events_by_date, timestamp = get_events_data(force_refresh=force_refresh)
-    formatted_output = format_calendar_output(events_by_date, days_ahead=days_ahead, timestamp=timestamp)
+    with metrics.traced('calendar.get'):
+        # Получаем данные (из кеша или Google Sheets)
+        events_by_date, timestamp = get_events_data(force_refresh=force_refresh)
+        formatted_output = _render(events_by_date, days_ahead, timestamp)
     return formatted_output
 
+def _render(events_by_date, days_ahead, timestamp):
+    """
+    Текст календаря из LRU готовых ответов
+    
+    Ключ включает сегодняшнюю дату, поэтому в полночь кеш сам переходит
+    на новое окно; после обновления данных старые тексты удаляются.
+    """
+    global _RENDERED_TIMESTAMP
+    key = (datetime.date.today(), days_ahead, timestamp)
+    with _RENDERED_LOCK:
+        text = _RENDERED.get(key)
+        if text is not None:
+            _RENDERED.move_to_end(key)
+            metrics.inc('rim_calendar_render_cache_total', result='hit')
+            return text
+    
+    metrics.inc('rim_calendar_render_cache_total', result='miss')
+    with metrics.stage('calendar.format'):
+        text = format_calendar_output(events_by_date, target_date=key[0], days_ahead=days_ahead,
+                                      timestamp=timestamp)
+    
+    with _RENDERED_LOCK:
+        if timestamp != _RENDERED_TIMESTAMP:
+            # Данные обновились - тексты по прошлым данным больше не нужны
+            _RENDERED.clear()
+            _RENDERED_TIMESTAMP = timestamp
+        _RENDERED[key] = text
+        while len(_RENDERED) > CALENDAR_RENDER_CACHE_SIZE:
+            _RENDERED.popitem(last=False)
+    return text
+
+def get_range(start, end, project=None, force_refresh=False):
+    """
+    События календаря в диапазоне дат [start, end), например за месяц
+    
+    Args:
+        start: Первая дата
+        end: Дата, следующая за последней
+        project: Только события этого проекта
+        force_refresh: Дождаться загрузки свежих данных
+        
+    Returns:
+        Список (дата, [события]) по возрастанию дат
+    """
+    events_by_date, _ = get_events_data(force_refresh=force_refresh)
+    return events_by_date.get_range(start, end, project)
+
 if __name__ == '__main__':
     print(get()) 
\ No newline at end of file
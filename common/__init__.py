@@ -0,0 +1 @@
+from .refresher import BackgroundRefresher
@@ -0,0 +1,237 @@
+import csv
+import datetime
+import os
+import threading
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from gspread.utils import fill_gaps
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+from common import sheets
+
+
+class DataSource(Protocol):
+    """Источник листов таблицы
+
+    Интерфейс повторяет ту часть gspread.Spreadsheet, которой пользуются
+    календарь и сетка, поэтому таблица gspread подходит как есть:
+    title, worksheets(), worksheet(title), values_batch_get(ranges).
+    Листы отдают значения через get_all_values().
+    """
+
+    title: str
+
+    def worksheets(self) -> List[Any]:
+        """Список листов"""
+        ...
+
+    def worksheet(self, title: str) -> Any:
+        """Лист по названию"""
+        ...
+
+    def values_batch_get(self, ranges: List[str], params: Optional[Dict] = None) -> Dict:
+        """Значения нескольких листов в формате ответа values:batchGet"""
+        ...
+
+
+def _cell_to_str(value: Any) -> str:
+    """Значение ячейки XLSX в том виде, в каком его отдает Google Sheets"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time():
+            return value.strftime('%d.%m.%Y')
+        return value.strftime('%d.%m.%Y %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.strftime('%d.%m.%Y')
+    if isinstance(value, datetime.time):
+        return f"{value.hour}:{value.minute:02d}"
+    return str(value)
+
+
+def _trim(rows: List[List[str]]) -> List[List[str]]:
+    """Удаление пустых строк в конце листа, как в ответах Sheets API"""
+    while rows and not any(cell != '' for cell in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def _read_csv(path: str) -> List[List[str]]:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return _trim([row for row in csv.reader(f)])
+
+
+def _read_xlsx(path: str) -> Dict[str, List[List[str]]]:
+    if openpyxl is None:
+        raise RuntimeError("Для чтения XLSX установите openpyxl: pip install openpyxl")
+    # read_only читает лист потоково, не загружая всю книгу в память
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        return {
+            worksheet.title: _trim([
+                [_cell_to_str(value) for value in row]
+                for row in worksheet.iter_rows(values_only=True)
+            ])
+            for worksheet in workbook.worksheets
+        }
+    finally:
+        workbook.close()
+
+
+def _file_version(path: str) -> Tuple[int, int]:
+    """Время модификации и размер файла: по ним и кешируется содержимое, и замечаются правки"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LocalWorksheet:
+    """Лист локальной копии таблицы"""
+
+    def __init__(self, source: 'LocalDataSource', title: str, id: int):
+        self._source = source
+        self.title = title
+        self.id = id
+
+    def get_all_values(self) -> List[List[str]]:
+        """Все значения листа, строки дополнены до одной длины (как в gspread)"""
+        return fill_gaps(self._source.read(self.title))
+
+
+class LocalDataSource(DataSource):
+    """Локальная копия таблицы: папка CSV-файлов (файл = лист) или файл XLSX
+
+    Файлы перечитываются, только если изменились их время модификации или размер;
+    signature() позволяет заметить правку, не перечитывая файлы.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.title = os.path.basename(os.path.normpath(path))
+        self._lock = threading.Lock()
+        # Путь к файлу -> ((mtime_ns, размер), {название листа: значения})
+        self._files: Dict[str, Tuple[Tuple[int, int], Dict[str, List[List[str]]]]] = {}
+
+    def _sheet_files(self) -> List[Tuple[str, str]]:
+        """Пары (название листа, файл) для CSV; для XLSX - файл книги"""
+        if os.path.isdir(self.path):
+            return [
+                (os.path.splitext(name)[0], os.path.join(self.path, name))
+                for name in sorted(os.listdir(self.path))
+                if name.lower().endswith('.csv')
+            ]
+        return [(title, self.path) for title in self._load(self.path)]
+
+    def signature(self) -> Tuple[Tuple[str, int, int], ...]:
+        """Файлы копии с временем модификации и размером: меняется при любой правке"""
+        if os.path.isdir(self.path):
+            paths = [
+                os.path.join(self.path, name)
+                for name in sorted(os.listdir(self.path))
+                if name.lower().endswith('.csv')
+            ]
+        else:
+            paths = [self.path]
+        result = []
+        for path in paths:
+            result.append((path,) + _file_version(path))
+        return tuple(result)
+
+    def _load(self, path: str) -> Dict[str, List[List[str]]]:
+        """Содержимое файла; перечитывается при изменении mtime или размера"""
+        version = _file_version(path)
+        with self._lock:
+            cached = self._files.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        if path.lower().endswith('.csv'):
+            sheets_data = {os.path.splitext(os.path.basename(path))[0]: _read_csv(path)}
+        else:
+            sheets_data = _read_xlsx(path)
+        print(f"Прочитан локальный файл {path}")
+        with self._lock:
+            self._files[path] = (version, sheets_data)
+        return sheets_data
+
+    def read(self, title: str) -> List[List[str]]:
+        """Значения листа по названию"""
+        for sheet_title, path in self._sheet_files():
+            if sheet_title == title:
+                return [list(row) for row in self._load(path)[title]]
+        raise KeyError(f"Лист {title} не найден в {self.path}")
+
+    def worksheets(self) -> List[LocalWorksheet]:
+        return [
+            LocalWorksheet(self, title, idx)
+            for idx, (title, _) in enumerate(self._sheet_files())
+        ]
+
+    def worksheet(self, title: str) -> LocalWorksheet:
+        for worksheet in self.worksheets():
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(f"Лист {title} не найден в {self.path}")
+
+    def values_batch_get(self, ranges: List[str], params: Optional[Dict] = None) -> Dict:
+        value_ranges = []
+        for range_name in ranges:
+            # Диапазоны приходят как absolute_range_name(title): 'Название листа'
+            title = range_name
+            if title.startswith("'") and title.endswith("'"):
+                title = title[1:-1].replace("''", "'")
+            value_ranges.append({'range': range_name, 'values': self.read(title)})
+        return {'valueRanges': value_ranges}
+
+
+_lock = threading.Lock()
+_local_sources: Dict[str, LocalDataSource] = {}
+
+
+def open_source(url: Optional[str], credentials_path: Optional[str] = None,
+                local_path: Optional[str] = None) -> DataSource:
+    """
+    Таблица для чтения: локальная копия, если она задана, иначе Google Sheets
+
+    Args:
+        url: URL Google таблицы
+        credentials_path: Путь к ключу сервисного аккаунта
+        local_path: Папка с CSV или файл XLSX с локальной копией таблицы
+
+    Returns:
+        LocalDataSource или gspread.Spreadsheet
+    """
+    if local_path:
+        key = os.path.abspath(local_path)
+        if not os.path.exists(key):
+            raise FileNotFoundError(f"Локальная копия таблицы не найдена: {local_path}")
+        with _lock:
+            source = _local_sources.get(key)
+            if source is None:
+                source = _local_sources[key] = LocalDataSource(key)
+        return source
+    if not url:
+        raise ValueError("Не задан URL таблицы")
+    return sheets.open_spreadsheet(url, credentials_path)
+
+
+def local_signature(local_path: Optional[str]) -> Optional[Tuple]:
+    """
+    Состояние файлов локальной копии таблицы
+
+    Returns:
+        LocalDataSource.signature() или None, если копия не задана или недоступна
+    """
+    if not local_path:
+        return None
+    try:
+        return open_source(None, local_path=local_path).signature()
+    except OSError:
+        return None
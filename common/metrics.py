@@ -0,0 +1,255 @@
+import contextlib
+import contextvars
+import json
+import threading
+import time
+import types
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import METRICS_ENABLED, METRICS_TRACE_REQUESTS
+
+# Гистограмма длительности этапов: fetch, parse, index, search, format...
+STAGE_METRIC = 'rim_stage_seconds'
+# Границы корзин гистограммы в секундах
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_enabled = METRICS_ENABLED
+# (имя, метки) -> [счетчики по корзинам..., сумма, количество]
+_histograms: Dict[Tuple[str, Labels], List[float]] = {}
+_counters: Dict[Tuple[str, Labels], float] = {}
+# (имя, метки) -> слабая ссылка на функцию показателя (сильная для обычных функций)
+_gauges: Dict[Tuple[str, Labels], Callable[[], Optional[Callable[[], Optional[float]]]]] = {}
+# Этапы текущего запроса в режиме трассировки
+_trace: contextvars.ContextVar = contextvars.ContextVar('rim_trace', default=None)
+_NOOP = contextlib.nullcontext()
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def enable(enabled: bool = True):
+    """Включение или отключение сбора метрик"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Сброс накопленных гистограмм и счетчиков"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name: str, value: float, **labels):
+    """Добавление значения в гистограмму"""
+    if not _enabled:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for idx, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram[idx] += 1
+                break
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Увеличение счетчика"""
+    if not _enabled:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_gauge(name: str, func: Callable[[], Optional[float]], **labels) -> bool:
+    """
+    Показатель, значение которого вычисляется при выгрузке (None - не выводить)
+
+    Метод объекта хранится по слабой ссылке: показатель исчезает вместе
+    с объектом и не держит его в памяти.
+
+    Returns:
+        False если показатель с таким именем и метками уже зарегистрирован
+    """
+    if isinstance(func, types.MethodType):
+        ref = weakref.WeakMethod(func)
+    else:
+        def ref():
+            return func
+    key = (name, _labels(labels))
+    with _lock:
+        current = _gauges.get(key)
+        if current is not None and current() is not None:
+            return False
+        _gauges[key] = ref
+    return True
+
+
+def unregister_gauge(name: str, **labels):
+    """Удаление показателя"""
+    with _lock:
+        _gauges.pop((name, _labels(labels)), None)
+
+
+class _StageTimer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        observe(STAGE_METRIC, elapsed, stage=self.stage)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+        return False
+
+
+def stage(name: str):
+    """
+    Замер длительности этапа: with metrics.stage('grid.fetch'): ...
+
+    Если метрики выключены и трассировки нет, возвращается общий пустой
+    контекстный менеджер без замера времени.
+    """
+    if not _enabled and _trace.get() is None:
+        return _NOOP
+    return _StageTimer(name)
+
+
+@contextlib.contextmanager
+def trace():
+    """Сбор этапов текущего запроса: with metrics.trace() as spans: ..."""
+    spans: List[Tuple[str, float]] = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def traced(request: str):
+    """Трассировка запроса с выводом этапов в лог, если включен METRICS_TRACE_REQUESTS"""
+    if not METRICS_TRACE_REQUESTS or _trace.get() is not None:
+        return _NOOP
+    return _print_trace(request)
+
+
+@contextlib.contextmanager
+def _print_trace(request: str):
+    start = time.perf_counter()
+    with trace() as spans:
+        yield spans
+    total = (time.perf_counter() - start) * 1000
+    details = ', '.join(f"{name} {elapsed * 1000:.2f} мс" for name, elapsed in spans)
+    print(f"Трассировка {request}: {total:.2f} мс ({details or 'без этапов'})")
+
+
+def _gauge_values() -> Dict[Tuple[str, Labels], float]:
+    with _lock:
+        gauges = list(_gauges.items())
+    values = {}
+    for key, ref in gauges:
+        func = ref()
+        if func is None:
+            # Объект показателя удален сборщиком мусора
+            with _lock:
+                if _gauges.get(key) is ref:
+                    del _gauges[key]
+            continue
+        try:
+            value = func()
+        except Exception:
+            value = None
+        if value is not None:
+            values[key] = value
+    return values
+
+
+def export_json() -> Dict[str, Any]:
+    """Все метрики в виде словаря (для JSON-выгрузки)"""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        counters = dict(_counters)
+
+    def entry(key, **fields):
+        name, labels = key
+        return {'name': name, 'labels': dict(labels), **fields}
+
+    return {
+        'enabled': _enabled,
+        'histograms': [
+            entry(key, buckets=dict(zip(map(str, BUCKETS), values[:len(BUCKETS)])),
+                  sum=values[-2], count=values[-1])
+            for key, values in histograms.items()
+        ],
+        'counters': [entry(key, value=value) for key, value in counters.items()],
+        'gauges': [entry(key, value=value) for key, value in _gauge_values().items()],
+    }
+
+
+def dump_json() -> str:
+    return json.dumps(export_json(), ensure_ascii=False, indent=2)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def export_prometheus() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    with _lock:
+        histograms = sorted((key, list(values)) for key, values in _histograms.items())
+        counters = sorted(_counters.items())
+    gauges = sorted(_gauge_values().items())
+
+    lines = []
+    typed = set()
+
+    def declare(name: str, kind: str):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), values in histograms:
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {values[-1]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+    for (name, labels), value in counters:
+        declare(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in gauges:
+        declare(name, 'gauge')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,272 @@
+import datetime
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from common import metrics
+
+# Как часто (в секундах) проверять источник на изменения при обращениях к кешу
+CHANGE_CHECK_INTERVAL = 1.0
+# Показатель возраста данных кеша
+AGE_GAUGE = 'rim_snapshot_age_seconds'
+
+
+class BackgroundRefresher:
+    """Потокобезопасный кеш с фоновым обновлением (stale-while-revalidate)
+
+    Пока данные моложе max_interval, они отдаются как есть. Более старые данные
+    тоже отдаются сразу, а обновление запускается в одном фоновом потоке.
+    Синхронно вызывающий поток ждет только если данных еще нет совсем или
+    запрошено принудительное обновление. Попытки загрузки (включая неудачные)
+    выполняются не чаще одного раза в min_interval секунд.
+
+    Если задана функция changed, данные считаются устаревшими и раньше
+    max_interval, как только она сообщает об изменении источника
+    (например, о правке файлов локальной копии таблицы).
+    """
+
+    def __init__(self, loader: Callable[[], Any], min_interval: float,
+                 max_interval: float, name: str = 'данные',
+                 changed: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            loader: Функция загрузки свежих данных
+            min_interval: Минимальный интервал между попытками загрузки в секундах
+            max_interval: Возраст данных в секундах, после которого они обновляются
+            name: Название данных для сообщений в логе
+            changed: Дешевая проверка, изменился ли источник с последней загрузки
+        """
+        self._loader = loader
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._value: Any = None
+        self._timestamp: Optional[datetime.datetime] = None
+        self._last_attempt: Optional[float] = None
+        self._last_error: Optional[Exception] = None
+        self._refreshing = False
+        # Сколько раз отработал загрузчик (seed_async не считается)
+        self._loads = 0
+        self._changed = changed
+        self._source_changed = False
+        self._checked_at: Optional[float] = None
+        self._gauge_labels = self._register_age_gauge()
+
+    def get(self, force_refresh: bool = False) -> Tuple[Any, Optional[datetime.datetime]]:
+        """
+        Получение данных и времени их загрузки
+
+        Args:
+            force_refresh: Дождаться загрузки свежих данных
+
+        Returns:
+            Кортеж (данные, время загрузки)
+        """
+        with self._lock:
+            if self._value is not None and not (force_refresh and self._can_attempt()):
+                stale = self._is_stale()
+                if stale and self._can_attempt() and self._begin():
+                    threading.Thread(
+                        target=self._load, name=f"refresh-{self.name}", daemon=True
+                    ).start()
+                metrics.inc('rim_cache_requests_total', cache=self.name,
+                            result='stale' if stale else 'hit')
+                return self._value, self._timestamp
+            if self._value is None and not self._refreshing and not self._can_attempt():
+                # Данных нет, а последняя попытка не удалась недавно:
+                # не повторяем загрузку на каждый запрос
+                metrics.inc('rim_cache_requests_total', cache=self.name, result='miss')
+                raise self._last_error or RuntimeError(f"Не удалось загрузить {self.name}")
+
+        metrics.inc('rim_cache_requests_total', cache=self.name, result='miss')
+        self._load_sync()
+        with self._lock:
+            if self._value is None:
+                raise self._last_error or RuntimeError(f"Не удалось загрузить {self.name}")
+            return self._value, self._timestamp
+
+    def refresh(self) -> Tuple[Any, Optional[datetime.datetime]]:
+        """
+        Синхронная загрузка свежих данных без учета min_interval
+
+        Если в этот момент готовятся начальные данные (seed_async), после них
+        все равно выполняется загрузка загрузчиком.
+
+        Raises:
+            Exception: Ошибка загрузчика, если загрузка не удалась
+        """
+        self._load_sync(need_loader=True)
+        with self._lock:
+            if self._last_error is not None:
+                raise self._last_error
+            return self._value, self._timestamp
+
+    def seed(self, value: Any, timestamp: datetime.datetime) -> bool:
+        """
+        Начальные данные (например, снимок с диска), если свежие еще не загружены
+
+        Returns:
+            True если данные приняты
+        """
+        with self._lock:
+            if self._value is not None:
+                return False
+            self._value = value
+            self._timestamp = timestamp
+            return True
+
+    def seed_async(self, builder: Callable[[], Tuple[Any, datetime.datetime]]) -> bool:
+        """
+        Начальные данные, которые готовятся в фоновом потоке (например, разбор снимка с диска)
+
+        Пока builder работает, get() ждет его результата, а не запускает
+        загрузку. Если builder не справился, тот же поток сразу загружает
+        свежие данные обычным загрузчиком.
+
+        Args:
+            builder: Функция, возвращающая (данные, время их загрузки)
+
+        Returns:
+            True если подготовка данных запущена
+        """
+        with self._lock:
+            if self._value is not None or self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(
+            target=self._seed, args=(builder,), name=f"seed-{self.name}", daemon=True
+        ).start()
+        return True
+
+    def close(self):
+        """Удаление показателя возраста данных из метрик"""
+        metrics.unregister_gauge(AGE_GAUGE, **self._gauge_labels)
+
+    def _register_age_gauge(self) -> Dict[str, str]:
+        """Показатель возраста данных; одноименные кеши получают метки name-2, name-3..."""
+        for number in itertools.count(1):
+            labels = {'cache': self.name if number == 1 else f"{self.name}-{number}"}
+            if metrics.register_gauge(AGE_GAUGE, self.age, **labels):
+                return labels
+
+    def age(self) -> Optional[float]:
+        """Возраст данных в секундах или None если данных нет"""
+        with self._lock:
+            return self._age()
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        """Ошибка последней неудачной загрузки"""
+        return self._last_error
+
+    def is_fresh(self) -> bool:
+        """Данные загружены и еще не устарели"""
+        with self._lock:
+            return self._value is not None and not self._is_stale()
+
+    def status(self) -> Dict[str, Any]:
+        """Состояние кеша для мониторинга"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'loaded_at': self._timestamp,
+                'age_seconds': self._age(),
+                'refreshing': self._refreshing,
+                'last_error': repr(self._last_error) if self._last_error else None,
+            }
+
+    def _age(self) -> Optional[float]:
+        if self._timestamp is None:
+            return None
+        return (datetime.datetime.now() - self._timestamp).total_seconds()
+
+    def _is_stale(self) -> bool:
+        age = self._age()
+        return age is None or age >= self.max_interval or self._check_changed()
+
+    def _check_changed(self) -> bool:
+        """Изменился ли источник (проверяется не чаще CHANGE_CHECK_INTERVAL)"""
+        if self._changed is None or self._source_changed:
+            return self._source_changed
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < CHANGE_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        try:
+            self._source_changed = bool(self._changed())
+        except Exception as e:
+            print(f"Ошибка проверки изменений ({self.name}): {e}")
+        return self._source_changed
+
+    def _can_attempt(self) -> bool:
+        return (self._last_attempt is None or
+                time.monotonic() - self._last_attempt >= self.min_interval)
+
+    def _begin(self) -> bool:
+        """Захват права на загрузку (только один поток загружает одновременно)"""
+        if self._refreshing:
+            return False
+        self._refreshing = True
+        self._last_attempt = time.monotonic()
+        return True
+
+    def _load_sync(self, need_loader: bool = False):
+        """
+        Загрузка в текущем потоке или ожидание уже идущей загрузки
+
+        Args:
+            need_loader: Подготовка начальных данных не заменяет загрузку -
+                после нее загрузчик запускается еще раз
+        """
+        while True:
+            with self._lock:
+                loads = self._loads
+                started = self._begin()
+            if started:
+                self._load()
+            with self._lock:
+                while self._refreshing:
+                    self._done.wait()
+                if not need_loader or self._loads != loads:
+                    return
+
+    def _seed(self, builder: Callable[[], Tuple[Any, datetime.datetime]]):
+        """Подготовка начальных данных; при ошибке - обычная загрузка"""
+        try:
+            value, timestamp = builder()
+        except Exception as e:
+            print(f"Ошибка подготовки начальных данных ({self.name}): {e}")
+            with self._lock:
+                self._last_attempt = time.monotonic()
+            self._load()
+            return
+
+        with self._lock:
+            self._value = value
+            self._timestamp = timestamp
+            self._refreshing = False
+            self._done.notify_all()
+
+    def _load(self):
+        """Загрузка данных вне блокировки с сохранением результата"""
+        try:
+            value = self._loader()
+            error = None
+        except Exception as e:
+            value = None
+            error = e
+            print(f"Ошибка обновления ({self.name}): {e}")
+
+        with self._lock:
+            if error is None:
+                self._value = value
+                self._timestamp = datetime.datetime.now()
+                self._source_changed = False
+            self._last_error = error
+            self._loads += 1
+            self._refreshing = False
+            self._done.notify_all()
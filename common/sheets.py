@@ -0,0 +1,175 @@
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import gspread
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from config import (
+    SHEETS_REQUESTS_PER_MINUTE, SHEETS_BURST, SHEETS_MAX_RETRIES,
+    SHEETS_BACKOFF_BASE_SECONDS, SHEETS_BACKOFF_MAX_SECONDS
+)
+
+# Коды ответа, при которых запрос повторяется
+_RETRY_CODES = {HTTPStatus.REQUEST_TIMEOUT, HTTPStatus.TOO_MANY_REQUESTS}
+
+
+class TokenBucket:
+    """Потокобезопасный ограничитель частоты запросов «корзина токенов»"""
+
+    def __init__(self, rate: float, capacity: int,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Скорость пополнения корзины в токенах в секунду
+            capacity: Размер корзины (сколько запросов можно отправить подряд)
+            clock: Монотонные часы в секундах
+            sleep: Функция ожидания
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Взять токен, дождавшись его при необходимости; возвращает время ожидания"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def available(self) -> float:
+        """Сколько токенов в корзине сейчас"""
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+
+class QuotaStats:
+    """Счетчики использования квоты Sheets API"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'throttled': 0,
+            'throttle_wait_seconds': 0.0,
+            'retries': 0,
+            'rate_limited': 0,
+            'errors': 0,
+        }
+
+    def add(self, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+
+_BUCKET = TokenBucket(SHEETS_REQUESTS_PER_MINUTE / 60, SHEETS_BURST)
+_STATS = QuotaStats()
+
+
+def _backoff(attempt: int) -> float:
+    """Экспоненциальная пауза со случайным разбросом (full jitter)"""
+    return random.uniform(0, min(SHEETS_BACKOFF_MAX_SECONDS, SHEETS_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class RateLimitedHTTPClient(HTTPClient):
+    """HTTP-клиент gspread с общим ограничителем частоты и повтором при 429"""
+
+    # Общие для всех клиентов процесса ограничитель, счетчики и функция ожидания
+    bucket = _BUCKET
+    stats = _STATS
+    sleep = staticmethod(time.sleep)
+
+    def request(self, *args: Any, **kwargs: Any):
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            if waited:
+                self.stats.add('throttled')
+                self.stats.add('throttle_wait_seconds', waited)
+            self.stats.add('requests')
+            try:
+                return super().request(*args, **kwargs)
+            except APIError as e:
+                code = e.code
+                if code == HTTPStatus.TOO_MANY_REQUESTS:
+                    self.stats.add('rate_limited')
+                retry = code in _RETRY_CODES or code >= HTTPStatus.INTERNAL_SERVER_ERROR
+                if not retry or attempt >= SHEETS_MAX_RETRIES:
+                    self.stats.add('errors')
+                    raise
+                delay = _backoff(attempt)
+                print(f"Google Sheets ответил {code}, повтор через {delay:.1f} с")
+                self.stats.add('retries')
+                attempt += 1
+                self.sleep(delay)
+
+
+_lock = threading.Lock()
+# Путь к ключу сервисного аккаунта -> клиент (одна HTTP-сессия и один токен на ключ)
+_clients: Dict[Optional[str], gspread.Client] = {}
+# (путь к ключу, URL таблицы) -> открытая таблица
+_spreadsheets: Dict[Tuple[Optional[str], str], gspread.Spreadsheet] = {}
+
+
+def get_client(credentials_path: Optional[str] = None) -> gspread.Client:
+    """
+    Общий клиент Google Sheets для файла ключа сервисного аккаунта
+
+    Args:
+        credentials_path: Путь к файлу ключа; None - путь gspread по умолчанию
+    """
+    key = os.path.abspath(credentials_path) if credentials_path else None
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if key is None:
+                client = gspread.service_account(http_client=RateLimitedHTTPClient)
+            else:
+                client = gspread.service_account(filename=key, http_client=RateLimitedHTTPClient)
+            _clients[key] = client
+        return client
+
+
+def open_spreadsheet(url: str, credentials_path: Optional[str] = None) -> gspread.Spreadsheet:
+    """Таблица по URL; открывается один раз на процесс"""
+    key = (os.path.abspath(credentials_path) if credentials_path else None, url)
+    with _lock:
+        spreadsheet = _spreadsheets.get(key)
+    if spreadsheet is None:
+        spreadsheet = get_client(credentials_path).open_by_url(url)
+        with _lock:
+            spreadsheet = _spreadsheets.setdefault(key, spreadsheet)
+    return spreadsheet
+
+
+def get_quota_stats() -> Dict[str, float]:
+    """Счетчики использования квоты для мониторинга"""
+    stats = _STATS.snapshot()
+    stats['tokens_available'] = _BUCKET.available()
+    stats['requests_per_minute'] = SHEETS_REQUESTS_PER_MINUTE
+    return stats
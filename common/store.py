@@ -0,0 +1,98 @@
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Optional, Tuple
+
+from config import SNAPSHOT_DIR
+
+# Версия формата файла; файлы другой версии игнорируются
+FORMAT_VERSION = 2
+
+
+def _path(kind: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{kind}.json")
+
+
+def fingerprint(values: Any) -> str:
+    """Отпечаток содержимого листа: совпадает, только если значения не менялись"""
+    data = json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def save(kind: str, payload: Any, timestamp: Optional[datetime.datetime] = None,
+         source: Any = None):
+    """
+    Сохранение снимка на диск (атомарно, через временный файл)
+
+    Args:
+        kind: Вид снимка ('calendar', 'grid')
+        payload: Данные, сериализуемые в JSON
+        timestamp: Время загрузки данных из Google Sheets
+        source: Описание источника (URL или локальный путь, листы), сериализуемое в JSON
+    """
+    timestamp = timestamp or datetime.datetime.now()
+    document = {
+        'format': FORMAT_VERSION,
+        'kind': kind,
+        'timestamp': timestamp.isoformat(),
+        'source': source,
+        'payload': payload,
+    }
+    try:
+        data = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+    except (TypeError, ValueError) as e:
+        print(f"Ошибка сохранения снимка {kind}: {e}")
+        return
+
+    tmp_path = None
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=f".{kind}.", suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, _path(kind))
+    except OSError as e:
+        print(f"Ошибка сохранения снимка {kind}: {e}")
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+
+def load(kind: str, source: Any = None) -> Optional[Tuple[Any, datetime.datetime]]:
+    """
+    Загрузка снимка с диска
+
+    Args:
+        kind: Вид снимка ('calendar', 'grid')
+        source: Ожидаемый источник; снимок другой таблицы не подходит
+
+    Returns:
+        Кортеж (данные, время загрузки) или None если снимка нет или он не подходит
+    """
+    try:
+        with open(_path(kind), encoding='utf-8') as f:
+            document = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения снимка {kind}: {e}")
+        return None
+
+    if not isinstance(document, dict):
+        print(f"Снимок {kind} поврежден, пропускаем")
+        return None
+    if document.get('format') != FORMAT_VERSION or document.get('kind') != kind:
+        print(f"Снимок {kind} устаревшего формата, пропускаем")
+        return None
+    # Сравниваем в JSON-виде: кортежи после сохранения становятся списками
+    if document.get('source') != json.loads(json.dumps(source)):
+        print(f"Снимок {kind} сохранен для другой таблицы, пропускаем")
+        return None
+    try:
+        return document['payload'], datetime.datetime.fromisoformat(document['timestamp'])
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Снимок {kind} поврежден, пропускаем: {e!r}")
+        return None
@@ -3,6 +3,7 @@
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения
@@ -11,9 +12,14 @@ load_dotenv()
 # === ФАЙЛЫ И ПУТИ ===
 CREDS_FILE = 'credentials.json'
 GRID_CREDENTIALS_PATH = "../credentials.json"
+# Папка для снимков данных на диске (быстрый старт без Google Sheets)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots"))
 
 # === ПЕРЕМЕННЫЕ ОКРУЖЕНИЯ ===
 CALENDAR_URL = os.getenv("CALENDAR_URL")
+# Локальные копии таблиц (папка с CSV или файл XLSX) вместо Google Sheets
+CALENDAR_LOCAL_PATH = os.getenv("CALENDAR_LOCAL_PATH")
+GRID_LOCAL_PATH = os.getenv("GRID_LOCAL_PATH")
 # BOT_TOKEN = os.getenv("BOT_TOKEN")
 # BOT_USERNAME = os.getenv("BOT_USERNAME")
 # DATABASE_URL = os.getenv("DATABASE_URL", "rim.db")
@@ -21,7 +27,59 @@ CALENDAR_URL = os.getenv("CALENDAR_URL")
 
 # === НАСТРОЙКИ КАЛЕНДАРЯ ===
 WORKSHEET_NAME = 'календарь new'
+# Год первого месяца первого листа; дальше год растет, когда номер месяца уменьшается
+CALENDAR_START_YEAR = int(os.getenv("CALENDAR_START_YEAR", "2025"))
+
+
+def _parse_calendar_worksheets(value):
+    """
+    Список листов "Название[:год начала]" через запятую -> [(название, год или None)]
+
+    Год без явного указания (None) продолжает предыдущий лист: например,
+    в "Сентябрь-Декабрь,Январь-Май" второй лист начинается следующим годом.
+    Первый лист без года начинается с CALENDAR_START_YEAR.
+    """
+    worksheets = []
+    for item in value.split(','):
+        title, _, year = item.strip().rpartition(':')
+        if not title or not year.isdigit():
+            title, year = item.strip(), ''
+        if title:
+            if year:
+                worksheets.append((title, int(year)))
+            else:
+                worksheets.append((title, None if worksheets else CALENDAR_START_YEAR))
+    return worksheets
+
+
+# Листы календаря (сезоны), объединяемые в один календарь
+CALENDAR_WORKSHEETS = _parse_calendar_worksheets(os.getenv("CALENDAR_WORKSHEETS", WORKSHEET_NAME))
+CALENDAR_PARSE_WORKERS = 4  # Процессов для параллельного разбора листов календаря
 CACHE_DURATION_HOURS = 1  # Время жизни кеша в часах
+CALENDAR_MIN_REFRESH_SECONDS = 60  # Минимальный интервал между загрузками календаря
+CALENDAR_MAX_REFRESH_SECONDS = CACHE_DURATION_HOURS * 3600  # Возраст, после которого календарь обновляется в фоне
+CALENDAR_RENDER_CACHE_SIZE = 32  # Сколько готовых текстов календаря хранить (LRU)
+
+# === ОГРАНИЧЕНИЕ ЗАПРОСОВ К GOOGLE SHEETS ===
+# Квота Sheets API на чтение: 60 запросов в минуту на пользователя
+SHEETS_REQUESTS_PER_MINUTE = 60
+SHEETS_BURST = 10  # Сколько запросов можно отправить подряд без ожидания
+SHEETS_MAX_RETRIES = 5  # Повторы запроса при 429 и ошибках сервера
+SHEETS_BACKOFF_BASE_SECONDS = 1  # Начальная пауза перед повтором
+SHEETS_BACKOFF_MAX_SECONDS = 64  # Максимальная пауза перед повтором
+
+# === СЕРВИС ЗАПРОСОВ БОТА ===
+SERVICE_WORKERS = 8  # Потоков для блокирующих запросов к календарю и сетке
+SERVICE_GRID_FUZZY = True  # Искать похожие ФИО, если точных совпадений нет
+SERVICE_MAX_CALENDAR_DAYS = 31  # Предел дней в одном ответе календаря
+
+# === ДЕМОН ===
+# Unix-сокет демона (python -m service.daemon); клиент rim_client.py читает ту же переменную
+DAEMON_SOCKET_PATH = os.getenv("DAEMON_SOCKET_PATH", os.path.join(tempfile.gettempdir(), "rim_bot.sock"))
+
+# === МЕТРИКИ ===
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"  # Сбор гистограмм этапов и счетчиков
+METRICS_TRACE_REQUESTS = os.getenv("METRICS_TRACE_REQUESTS", "0") == "1"  # Вывод этапов каждого запроса в лог
 
 # === СООТВЕТСТВИЕ РУССКИХ МЕСЯЦЕВ ЧИСЛАМ ===
 MONTHS = {
@@ -49,6 +107,17 @@ WEEKDAY_NAMES = [
 
 # === НАСТРОЙКИ GRID SCHEDULER ===
 DEFAULT_GRID_DAYS = ['четверг', 'пятница', 'суббота', 'воскресенье']
+GRID_SNAPSHOT_TTL_SECONDS = 300  # Время жизни снимка сетки в секундах
+GRID_MIN_REFRESH_SECONDS = 30  # Минимальный интервал между загрузками сетки
+GRID_FETCH_WORKERS = 4  # Максимум одновременных запросов к листам сетки
+GRID_FETCH_TIMEOUT_SECONDS = 30  # Предельное время ожидания запроса к таблице (всех листов сразу)
+# Активности, при которых организатор считается свободным
+GRID_FREE_ACTIVITIES = ['свободен', 'свободна', 'свободное время']
+GRID_FUZZY_BUDGET_MS = 50  # Предельное время нечеткого поиска в миллисекундах
+GRID_FUZZY_MIN_SCORE = 0.6  # Минимальная похожесть ФИО при нечетком поиске (0..1)
+GRID_FUZZY_LIMIT = 5  # Сколько вариантов предлагать при нечетком поиске
+GRID_FUZZY_LEADER_MARGIN = 0.1  # На сколько лучший вариант должен опережать второй, чтобы ответить его расписанием
+GRID_HISTORY_SIZE = 5  # Сколько последних снимков сетки хранить для ленты изменений
 
 # === ПРОВЕРКИ ОБЯЗАТЕЛЬНЫХ ПЕРЕМЕННЫХ ===
 def validate_config():
@@ -0,0 +1,122 @@
+import time
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+from grid.index import NameIndex, normalize_name
+
+# Латиница -> кириллица для фамилий, набранных транслитом (сначала длинные сочетания)
+_TRANSLIT = [
+    ('shch', 'щ'), ('sch', 'щ'), ('yo', 'е'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'),
+    ('iya', 'ия'), ('iyu', 'ию'),  # Мария, Юлию: раньше, чем iy -> ий
+    ('ch', 'ч'), ('sh', 'ш'), ('yu', 'ю'), ('ya', 'я'), ('iy', 'ий'), ('yy', 'ый'),
+    ('a', 'а'), ('b', 'б'), ('v', 'в'), ('g', 'г'), ('d', 'д'), ('e', 'е'), ('z', 'з'),
+    ('i', 'и'), ('y', 'й'), ('j', 'й'), ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'),
+    ('o', 'о'), ('p', 'п'), ('r', 'р'), ('s', 'с'), ('t', 'т'), ('u', 'у'), ('f', 'ф'),
+    ('h', 'х'), ('c', 'к'), ('w', 'в'), ('x', 'кс'), ('q', 'к'),
+]
+
+# Сколько лучших по триграммам слов проверяется расстоянием Левенштейна
+_CANDIDATE_WORDS = 50
+
+
+def transliterate(text: str) -> str:
+    """Перевод латиницы в кириллицу (кириллица остается без изменений)"""
+    result = []
+    i = 0
+    while i < len(text):
+        for latin, cyrillic in _TRANSLIT:
+            if text.startswith(latin, i):
+                result.append(cyrillic)
+                i += len(latin)
+                break
+        else:
+            result.append(text[i])
+            i += 1
+    return ''.join(result)
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: str, b: str) -> float:
+    """Похожесть слов: 1 - расстояние Левенштейна / длина большего слова"""
+    if a == b:
+        return 1.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+class FuzzyIndex:
+    """Триграммный индекс по словам ФИО для поиска с опечатками"""
+
+    def __init__(self, name_index: NameIndex):
+        self.name_index = name_index
+        # Слово ФИО -> нормализованные ФИО, в которых оно есть
+        self.words: Dict[str, Set[str]] = {}
+        for name in name_index.positions:
+            for word in name.split():
+                self.words.setdefault(word, set()).add(name)
+        # Триграмма -> слова, в которых она встречается
+        self.trigrams: Dict[str, Set[str]] = {}
+        for word in self.words:
+            for trigram in _trigrams(word):
+                self.trigrams.setdefault(trigram, set()).add(word)
+
+    def _similar_words(self, query_word: str, deadline: float) -> Dict[str, float]:
+        """Слова индекса, похожие на слово запроса, с их похожестью"""
+        counts = Counter()
+        for trigram in _trigrams(query_word):
+            counts.update(self.trigrams.get(trigram, ()))
+
+        similar = {}
+        for word, _ in counts.most_common(_CANDIDATE_WORDS):
+            if time.monotonic() > deadline:
+                break
+            similar[word] = _similarity(query_word, word)
+        return similar
+
+    def search(self, search_query: str, limit: int, budget_ms: float,
+               min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Поиск ФИО, похожих на запрос
+
+        Args:
+            search_query: Фамилия или "Фамилия Имя", возможно с опечатками или транслитом
+            limit: Максимальное число результатов
+            budget_ms: Предельное время поиска в миллисекундах
+            min_score: Минимальная похожесть результата (0..1)
+
+        Returns:
+            Список (нормализованное ФИО, похожесть) по убыванию похожести
+        """
+        deadline = time.monotonic() + budget_ms / 1000
+        query_words = transliterate(normalize_name(search_query)[:64]).split()[:4]
+        if not query_words:
+            return []
+
+        scores: Dict[str, float] = {}
+        for query_word in query_words:
+            best: Dict[str, float] = {}
+            for word, similarity in self._similar_words(query_word, deadline).items():
+                for name in self.words[word]:
+                    if similarity > best.get(name, 0.0):
+                        best[name] = similarity
+            for name, similarity in best.items():
+                scores[name] = scores.get(name, 0.0) + similarity / len(query_words)
+
+        ranked = sorted(
+            ((name, score) for name, score in scores.items() if score >= min_score),
+            key=lambda item: (-item[1], item[0])
+        )
+        return ranked[:limit]
@@ -1,7 +1,9 @@
+import datetime
 import gspread
-import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 import os
 import sys
 from pathlib import Path
@@ -11,7 +13,20 @@ current_dir = Path(__file__).parent.parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
-from config import GRID_CREDENTIALS_PATH, DEFAULT_GRID_DAYS, WEEKDAY_NAMES
+from config import (
+    GRID_CREDENTIALS_PATH, GRID_LOCAL_PATH, DEFAULT_GRID_DAYS, WEEKDAY_NAMES,
+    GRID_SNAPSHOT_TTL_SECONDS, GRID_MIN_REFRESH_SECONDS,
+    GRID_FETCH_WORKERS, GRID_FETCH_TIMEOUT_SECONDS, WEEKDAYS,
+    GRID_FUZZY_BUDGET_MS, GRID_FUZZY_MIN_SCORE, GRID_FUZZY_LIMIT, GRID_FUZZY_LEADER_MARGIN,
+    GRID_HISTORY_SIZE
+)
+from common import datasource, metrics, sheets, store
+from common.refresher import BackgroundRefresher
+from grid.index import NAME_COLUMN, normalize_name
+from grid.intervals import MINUTES_PER_DAY, time_to_minutes
+from grid.snapshot import (
+    DaySheet, GridRow, GridSnapshot, build_snapshot, diff_snapshots, fetch_day_values
+)
 
 scheduler = None
 spreadsheet_url = None
@@ -20,15 +35,20 @@ credentials_path = GRID_CREDENTIALS_PATH
 class GridScheduler:
     """Класс для работы с расписанием событий через Google Sheets"""
     
-    def __init__(self, spreadsheet_url: str = None, credentials_path: str = None):
+    def __init__(self, spreadsheet_url: str = None, credentials_path: str = None,
+                 snapshot_ttl: int = None, local_path: str = None):
         """
         Инициализация подключения к Google Sheets
         
         Args:
             spreadsheet_url: URL Google таблицы
             credentials_path: Путь к JSON файлу с credentials
+            snapshot_ttl: Время жизни снимка сетки в секундах
+            local_path: Локальная копия таблицы (папка с CSV или файл XLSX)
         """
         self.spreadsheet_url = spreadsheet_url
+        self.local_path = local_path or GRID_LOCAL_PATH
+        self.snapshot_ttl = GRID_SNAPSHOT_TTL_SECONDS if snapshot_ttl is None else snapshot_ttl
         # Если путь к credentials не абсолютный, ищем рядом со скриптом
         if credentials_path and os.path.isabs(credentials_path):
             self.credentials_path = credentials_path
@@ -38,30 +58,62 @@ class GridScheduler:
         print(self.credentials_path)
         self.gc = None
         self.spreadsheet = None
+        # Справочник {день: лист}, строится при подключении и сбрасывается
+        # только при ошибке поиска листа или явном refresh()
+        self._worksheets: Optional[Dict[str, gspread.Worksheet]] = None
+        # Общий пул для запросов к листам и метаданным таблицы
+        self._executor = ThreadPoolExecutor(
+            max_workers=GRID_FETCH_WORKERS, thread_name_prefix='grid-fetch'
+        )
+        # Снимок всех дневных листов, из которого отвечают поиски;
+        # устаревший снимок отдается, пока новый загружается в фоне
+        self._refresher = BackgroundRefresher(
+            self._load_snapshot,
+            min_interval=GRID_MIN_REFRESH_SECONDS,
+            max_interval=self.snapshot_ttl,
+            name='сетка',
+            changed=self._local_source_changed
+        )
+        # Состояние файлов локальной копии при последней загрузке
+        self._source_signature = None
+        self._snapshot_version = 0
+        # Готовые ответы бота: (нормализованное ФИО, версия снимка) -> текст
+        self._rendered: Dict[Tuple[str, int], str] = {}
+        # Последний собранный снимок: при обновлении заново разбираются только изменившиеся листы
+        self._last_snapshot: Optional[GridSnapshot] = None
+        # Последние снимки для ленты изменений расписаний
+        self._history = deque(maxlen=GRID_HISTORY_SIZE)
         # Список дней недели по умолчанию (будет обновлен после подключения)
         self.days = DEFAULT_GRID_DAYS.copy()
         
         # Названия дней недели для поиска в названиях листов
         self.weekday_names = WEEKDAY_NAMES
-        # Подключаемся только если есть URL и credentials файл существует
-        if self.spreadsheet_url and os.path.exists(self.credentials_path):
-            if self.connect():
-                # Обновляем список дней из названий листов
-                self.days = self._get_days_from_sheets()
+        
+        # Сохраненный снимок позволяет отвечать сразу, а подключение
+        # к Google Sheets произойдет при фоновом обновлении
+        if not self._restore_snapshot():
+            self._connect_and_discover_days()
         
     def connect(self) -> bool:
-        """Подключение к Google Sheets"""
-        if not self.spreadsheet_url:
+        """Подключение к Google Sheets или к локальной копии таблицы"""
+        if not self.spreadsheet_url and not self.local_path:
             return False
             
         try:
+            if self.local_path:
+                self.spreadsheet = datasource.open_source(None, local_path=self.local_path)
+                print(f"Используется локальная копия таблицы {self.local_path}")
+                return True
+            
             if os.path.exists(self.credentials_path):
-                self.gc = gspread.service_account(filename=self.credentials_path)
+                credentials_path = self.credentials_path
             else:
                 # Попробуем использовать переменные окружения
-                self.gc = gspread.service_account()
+                credentials_path = None
                 
-            self.spreadsheet = self.gc.open_by_url(self.spreadsheet_url)
+            # Клиент и его HTTP-сессия общие с календарем
+            self.gc = sheets.get_client(credentials_path)
+            self.spreadsheet = datasource.open_source(self.spreadsheet_url, credentials_path)
             print(f"Успешно подключились к Google Sheets {self.spreadsheet.title}")
             return True
             
@@ -69,59 +121,310 @@ class GridScheduler:
             print(f"Ошибка подключения к Google Sheets: {e}")
             return False
     
-    def search_person(self, search_query: str) -> Optional[Dict]:
+    def _connect_and_discover_days(self) -> bool:
+        """Подключение и получение списка дней из названий листов"""
+        # Подключаемся только если есть URL и credentials файл существует
+        if self.local_path or (self.spreadsheet_url and os.path.exists(self.credentials_path)):
+            if self.connect():
+                # Обновляем список дней из названий листов
+                self.days = self._get_days_from_sheets()
+                return True
+        return False
+    
+    def refresh(self) -> bool:
         """
-        Поиск человека по фамилии или фамилии + имени
+        Принудительная перезагрузка снимка сетки
         
-        Args:
-            search_query: Фамилия или "Фамилия Имя" для поиска
-            
         Returns:
-            Словарь с данными человека или None если не найден
+            True если снимок обновлен
         """
-        search_query = search_query.strip()
+        # Листы могли добавить или переименовать: заново определяем дни
+        self._invalidate_worksheet_directory()
+        self.days = self._get_days_from_sheets()
+        try:
+            self._refresher.refresh()
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки снимка сетки: {e}")
+            return False
+    
+    def load(self) -> bool:
+        """
+        Загрузка снимка сетки, если его еще нет (например, при старте сервиса)
         
+        Returns:
+            True если снимок доступен
+        """
+        return self._get_snapshot() is not None
+    
+    def close(self):
+        """Остановка пула запросов к таблице и удаление показателей снимка из метрик"""
+        self._refresher.close()
+        self._executor.shutdown(wait=False)
+    
+    def get_refresh_status(self) -> Dict:
+        """Состояние снимка сетки: возраст данных и последняя ошибка"""
+        status = self._refresher.status()
+        status['version'] = self._snapshot_version
+        return status
+    
+    def _load_snapshot(self) -> GridSnapshot:
+        """Загрузка нового снимка сетки из Google Sheets"""
+        if not self.spreadsheet and not self._connect_and_discover_days():
+            raise RuntimeError("Нет подключения к Google Sheets")
+        
+        signature = datasource.local_signature(self.local_path)
+        day_worksheets = self._get_worksheet_directory()
+        day_values = self._fetch_day_values(day_worksheets)
+        if len(day_values) < len(day_worksheets):
+            # Часть листов не загрузилась (например, лист переименован) -
+            # перестраиваем справочник листов и пробуем еще раз
+            self._invalidate_worksheet_directory()
+            day_worksheets = self._get_worksheet_directory()
+            day_values = self._fetch_day_values(day_worksheets)
+        missing = [day for day in day_worksheets if day not in day_values]
+        if missing:
+            # Неполный снимок не отдаем и не сохраняем: до следующей
+            # попытки отвечаем из предыдущего полного снимка
+            raise RuntimeError(f"Не загружены листы: {', '.join(missing)}")
+        loaded_at = datetime.datetime.now()
+        previous = self._last_snapshot
+        snapshot = self._build_snapshot(day_values, loaded_at)
+        self._source_signature = signature
+        # Сохраняем снимок для быстрого старта следующего процесса
+        # (если листы не изменились, файл на диске уже актуален)
+        if previous is None or snapshot.fingerprints != previous.fingerprints:
+            store.save('grid', {'days': day_values}, loaded_at, self._snapshot_source())
+        return snapshot
+    
+    def _local_source_changed(self) -> bool:
+        """Изменились ли файлы локальной копии с последней загрузки"""
+        if not self.local_path:
+            return False
+        return datasource.local_signature(self.local_path) != self._source_signature
+    
+    def _snapshot_source(self) -> Dict[str, Optional[str]]:
+        """Таблица, из которой получен снимок: снимок другой таблицы при старте не используется"""
+        if self.local_path:
+            return {'local_path': os.path.abspath(self.local_path)}
+        return {'url': self.spreadsheet_url}
+    
+    def _fetch_day_values(self, day_worksheets: Dict[str, gspread.Worksheet]) -> Dict[str, List[List[str]]]:
+        """Загрузка значений дневных листов из справочника"""
+        with metrics.stage('grid.fetch'):
+            return fetch_day_values(
+                self.spreadsheet, day_worksheets,
+                executor=self._executor, timeout=GRID_FETCH_TIMEOUT_SECONDS
+            )
+    
+    def _build_snapshot(self, day_values: Dict[str, List[List[str]]],
+                        loaded_at: datetime.datetime) -> GridSnapshot:
+        """Разбор значений листов в снимок и отрисовка готовых ответов"""
+        self._snapshot_version += 1
+        snapshot = build_snapshot(day_values, self._snapshot_version, loaded_at, self._last_snapshot)
+        with metrics.stage('grid.render'):
+            self._rendered = self._render_snapshot(snapshot, self._last_snapshot)
+        self._last_snapshot = snapshot
+        self._history.append(snapshot)
+        print(f"Снимок сетки обновлен (версия {self._snapshot_version}, "
+              f"изменено листов: {len(snapshot.changed_days)})")
+        return snapshot
+    
+    def _restore_snapshot(self) -> bool:
+        """
+        Загрузка сохраненного на диске снимка сетки
+        
+        Читается только файл; разбор значений в снимок идет в фоновом потоке,
+        запросы до его окончания ждут готовый снимок, а не Google Sheets.
+        """
+        restored = store.load('grid', self._snapshot_source())
+        if restored is None:
+            return False
+        
+        payload, loaded_at = restored
+        day_values = payload.get('days') if isinstance(payload, dict) else None
+        if not isinstance(day_values, dict):
+            print("Сохраненный снимок сетки поврежден, пропускаем")
+            return False
+        if day_values:
+            self.days = list(day_values)
+        
+        def build():
+            snapshot = self._build_snapshot(day_values, loaded_at)
+            print(f"Сетка загружена с диска (обновлена {loaded_at.strftime('%Y-%m-%d %H:%M:%S')})")
+            return snapshot, loaded_at
+        
+        return self._refresher.seed_async(build)
+    
+    def _get_snapshot(self) -> Optional[GridSnapshot]:
+        """Получение снимка; устаревший снимок обновляется в фоне"""
         try:
-            # Работаем только с Google Sheets
-            if self.spreadsheet:
-                return self._search_in_google_sheets(search_query)
-            else:
-                print("Нет подключения к Google Sheets")
-                return None
-                
+            snapshot, _ = self._refresher.get()
+            return snapshot
         except Exception as e:
-            print(f"Ошибка при поиске: {e}")
+            print(f"Снимок сетки недоступен: {e}")
             return None
     
-    def _match_person(self, full_name: str, search_query: str) -> bool:
+    def _render_snapshot(self, snapshot: GridSnapshot,
+                         previous: Optional[GridSnapshot] = None) -> Dict[Tuple[str, int], str]:
+        """
+        Предварительная отрисовка ответов для организаторов снимка
+
+        Ответы тех, чьи строки не менялись с прошлого снимка, переносятся
+        из него без повторной отрисовки.
         """
-        Проверка соответствия ФИО поисковому запросу
+        rendered = {}
+        if previous is not None:
+            for (name, version), reply in self._rendered.items():
+                if (version == previous.version and name not in snapshot.touched_names
+                        and name in snapshot.index.positions):
+                    rendered[(name, snapshot.version)] = reply
+
+        for name in snapshot.touched_names:
+            days = snapshot.index.positions.get(name)
+            if days is None:
+                continue
+            matched_rows = {day: (row_idx, name) for day, row_idx in days.items()}
+            person_data = self._collect_person_data(snapshot, matched_rows)
+            if person_data:
+                rendered[(name, snapshot.version)] = self.format_schedule_for_bot(person_data)
+        return rendered
+    
+    def _get_rendered(self, snapshot: GridSnapshot,
+                      matched_rows: Dict[str, Tuple[int, str]]) -> Optional[str]:
+        """Готовый ответ, если найденные строки принадлежат одному человеку"""
+        names = {name for _, name in matched_rows.values()}
+        if len(names) != 1:
+            return None
+        return self._rendered.get((names.pop(), snapshot.version))
+    
+    def _reply(self, snapshot: GridSnapshot,
+               matched_rows: Dict[str, Tuple[int, str]]) -> Optional[str]:
+        """Текст ответа по найденным строкам: готовый или отрисованный сейчас"""
+        reply = self._get_rendered(snapshot, matched_rows)
+        if reply is not None:
+            metrics.inc('rim_reply_cache_total', result='hit')
+            return reply
+        metrics.inc('rim_reply_cache_total', result='miss')
+        with metrics.stage('grid.format'):
+            person_data = self._collect_person_data(snapshot, matched_rows)
+            return self.format_schedule_for_bot(person_data) if person_data else None
+    
+    def _answer(self, snapshot: GridSnapshot, search_query: str, fuzzy: bool = False) -> Dict:
+        """
+        Ответ на один запрос по снимку
         
         Args:
-            full_name: Полное имя из таблицы
+            snapshot: Снимок сетки
             search_query: Поисковый запрос
-            
+            fuzzy: Искать похожие ФИО, если точных совпадений нет
+        
         Returns:
-            True если найдено соответствие
+            Словарь с полями query, status ('found', 'ambiguous', 'fuzzy', 'not_found'),
+            matches (подходящие ФИО) и reply (текст ответа бота)
         """
-        if pd.isna(full_name):
-            return False
-            
-        full_name = str(full_name).lower().strip()
-        search_query = search_query.lower().strip()
+        answer = self._not_found(search_query)
+        query = search_query.strip()
+        with metrics.stage('grid.search'):
+            candidates = snapshot.index.candidates(query)
+            matched_rows = snapshot.index.lookup(query, candidates)
+        if matched_rows:
+            answer['status'] = 'ambiguous' if len(candidates) > 1 else 'found'
+            answer['matches'] = sorted(snapshot.index.display[name] for name in candidates)
+            reply = self._reply(snapshot, matched_rows)
+            if reply is None:
+                return self._not_found(search_query)
+            answer['reply'] = reply
+        elif fuzzy:
+            return self._fuzzy_answer(snapshot, search_query)
+        return answer
+    
+    def _fuzzy_answer(self, snapshot: GridSnapshot, search_query: str) -> Dict:
+        """Ответ по похожим ФИО: расписание явного лидера или список вариантов"""
+        answer = self._not_found(search_query)
+        with metrics.stage('grid.fuzzy'):
+            ranked = snapshot.fuzzy.search(
+                search_query, GRID_FUZZY_LIMIT, GRID_FUZZY_BUDGET_MS, GRID_FUZZY_MIN_SCORE
+            )
+        if not ranked:
+            return answer
         
-        # Разбиваем поисковый запрос на слова
-        search_words = search_query.split()
+        answer['matches'] = [snapshot.index.display[name] for name, _ in ranked]
+        best_name, best_score = ranked[0]
+        # Отвечаем расписанием, только если лучший вариант заметно лучше остальных
+        if len(ranked) == 1 or best_score - ranked[1][1] >= GRID_FUZZY_LEADER_MARGIN:
+            matched_rows = {
+                day: (row_idx, best_name)
+                for day, row_idx in snapshot.index.positions[best_name].items()
+            }
+            reply = self._reply(snapshot, matched_rows)
+            if reply is not None:
+                answer['status'] = 'fuzzy'
+                answer['reply'] = reply
+                return answer
         
-        if len(search_words) == 1:
-            # Поиск только по фамилии
-            return search_words[0] in full_name
+        answer['reply'] += f". Возможно, вы искали: {', '.join(answer['matches'])}"
+        return answer
+    
+    def search_fuzzy(self, search_query: str, limit: int = None) -> List[Tuple[str, float]]:
+        """
+        Нечеткий поиск сотрудников (опечатки, транслит)
+        
+        Args:
+            search_query: Фамилия или "Фамилия Имя"
+            limit: Максимальное число вариантов
+            
+        Returns:
+            Список (ФИО, похожесть от 0 до 1) по убыванию похожести
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is None or not search_query:
+            return []
+        ranked = snapshot.fuzzy.search(
+            search_query, limit or GRID_FUZZY_LIMIT, GRID_FUZZY_BUDGET_MS, GRID_FUZZY_MIN_SCORE
+        )
+        return [(snapshot.index.display[name], score) for name, score in ranked]
+    
+    def _not_found(self, search_query: str) -> Dict:
+        """Ответ для запроса, по которому никто не найден"""
+        if not search_query:
+            reply = "Ошибка: Введите фамилию или фамилию+имя для поиска"
         else:
-            # Поиск по нескольким словам - все должны присутствовать
-            return all(word in full_name for word in search_words)
+            reply = f"Сотрудник '{search_query}' не найден"
+        return {'query': search_query, 'status': 'not_found', 'matches': [], 'reply': reply}
+    
+    def search_person(self, search_query: str) -> Optional[Dict]:
+        """
+        Поиск человека по фамилии или фамилии + имени
+        
+        Args:
+            search_query: Фамилия или "Фамилия Имя" для поиска
+            
+        Returns:
+            Словарь с данными человека или None если не найден
+        """
+        search_query = search_query.strip()
+        
+        try:
+            # Работаем только со снимком Google Sheets
+            return self._search_in_google_sheets(search_query)
+                
+        except Exception as e:
+            print(f"Ошибка при поиске: {e}")
+            return None
     
     def _search_in_google_sheets(self, search_query: str) -> Optional[Dict]:
-        """Поиск в Google Sheets"""
+        """Поиск по снимку листов Google Sheets"""
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            print("Нет подключения к Google Sheets")
+            return None
+        
+        return self._collect_person_data(snapshot, snapshot.index.lookup(search_query))
+    
+    def _collect_person_data(self, snapshot: GridSnapshot,
+                             matched_rows: Dict[str, Tuple[int, str]]) -> Optional[Dict]:
+        """Сборка данных человека из найденных строк снимка"""
         person_data = {
             'name': '',
             'phone': '',
@@ -133,29 +436,22 @@ class GridScheduler:
         
         for day in self.days:
             try:
-                worksheet = self._get_worksheet_for_day(day)
-                if not worksheet:
-                    print(f"Лист для дня {day} не найден")
+                if day not in matched_rows:
                     continue
-                    
-                data = worksheet.get_all_records()
-                df = pd.DataFrame(data)
+                row_idx, _ = matched_rows[day]
                 
-                # Поиск по фамилии или фамилии+имени
-                mask = df['Организатор'].apply(lambda x: self._match_person(x, search_query))
+                sheet = snapshot.sheets[day]
+                found = True
+                person_row = sheet.rows[row_idx]
                 
-                if mask.any():
-                    found = True
-                    person_row = df[mask].iloc[0]
-                    
-                    if not person_data['name']:
-                        person_data['name'] = person_row['Организатор']
-                        person_data['phone'] = str(person_row.get('Телефон', ''))
-                        person_data['position'] = person_row.get('Должность', '')
-                    
-                    # Извлекаем расписание на день
-                    schedule = self._extract_schedule(person_row, df.columns)
-                    person_data['schedule'][day] = schedule
+                if not person_data['name']:
+                    person_data['name'] = person_row[NAME_COLUMN]
+                    person_data['phone'] = str(person_row.get('Телефон', ''))
+                    person_data['position'] = person_row.get('Должность', '')
+                
+                # Извлекаем расписание на день
+                schedule = self._extract_schedule(person_row, sheet)
+                person_data['schedule'][day] = schedule
                     
             except Exception as e:
                 print(f"Ошибка обработки листа {day}: {e}")
@@ -163,67 +459,18 @@ class GridScheduler:
         
         return person_data if found else None
     
-    def _extract_schedule(self, person_row, columns) -> List[Dict]:
-        """Извлечение расписания из строки данных"""
-        schedule = []
-        
-        # Получаем временные колонки в порядке следования в таблице
-        time_columns = []
-        for col in columns:
-            if isinstance(col, time) or ':' in str(col):
-                time_columns.append(col)
-        
-        # НЕ сортируем - берем в порядке колонок в таблице
-        
-        # Собираем все активности с их временами
-        activities = []
-        for time_col in time_columns:
-            activity = person_row.get(time_col)
-            if pd.notna(activity) and str(activity).strip():
-                activities.append({
-                    'time': time_col,
-                    'activity': str(activity).strip()
-                })
-        
-        # Группируем соседние одинаковые активности
-        if not activities:
-            return schedule
-        current_start = activities[0]['time']
-        current_activity = activities[0]['activity']
-        
-        for i in range(1, len(activities)):
-            if activities[i]['activity'] != current_activity:
-                # Добавляем завершенную активность
-                schedule.append({
-                    'start': self._format_time(current_start),
-                    'end': self._format_time(activities[i]['time']),
-                    'activity': current_activity
-                })
-                
-                # Начинаем новую активность
-                current_start = activities[i]['time']
-                current_activity = activities[i]['activity']
-        
-        # Добавляем последнюю активность
-        schedule.append({
-            'start': self._format_time(current_start),
-            'end': 'До конца',
-            'activity': current_activity
-        })
-        
-        return schedule
-    
-    def _time_to_minutes(self, time_obj) -> int:
-        """Конвертация времени в минуты для сортировки"""
-        if isinstance(time_obj, time):
-            return time_obj.hour * 60 + time_obj.minute
-        elif isinstance(time_obj, str) and ':' in time_obj:
-            try:
-                h, m = map(int, time_obj.split(':')[:2])
-                return h * 60 + m
-            except:
-                return 0
-        return 0
+    def _extract_schedule(self, person_row: GridRow, sheet: DaySheet) -> List[Dict]:
+        """Извлечение расписания из отрезков строки данных"""
+        time_columns = sheet.time_columns
+        activity_names = sheet.activities.names
+        return [
+            {
+                'start': self._format_time(time_columns[start]),
+                'end': self._format_time(time_columns[end]) if end is not None else 'До конца',
+                'activity': activity_names[activity_id]
+            }
+            for start, end, activity_id in person_row.segments
+        ]
     
     def _format_time(self, time_obj) -> str:
         """Форматирование времени для вывода"""
@@ -249,7 +496,7 @@ class GridScheduler:
             if day not in person_schedule:
                 continue
             output[day] = ""
-            output[day] += f"{day_names[day]}: \n"
+            output[day] += f"{day_names.get(day, day)}: \n"
 
             schedule = person_schedule[day]
             for item in schedule:
@@ -257,17 +504,43 @@ class GridScheduler:
             
             output[day] += "\n"
         return output
-    def get(self, search_query: str):
+    def get(self, search_query: str, fuzzy: bool = False):
         """Получение расписания сотрудника для бота"""
-        if not search_query:
-            return "Ошибка: Введите фамилию или фамилию+имя для поиска"
+        return self.search_people([search_query], fuzzy=fuzzy)[search_query]['reply']
+    
+    def search_people(self, queries: List[str], fuzzy: bool = False) -> Dict[str, Dict]:
+        """
+        Поиск сразу нескольких сотрудников по одному снимку
         
-        person_data = self.search_person(search_query)
-        if person_data:
-            # Возвращаем форматированное расписание
-            return self.format_schedule_for_bot(person_data)
-        else:
-            return f"Сотрудник '{search_query}' не найден"
+        Args:
+            queries: Фамилии или "Фамилия Имя" для поиска
+            fuzzy: Для ненайденных запросов искать похожие ФИО
+            
+        Returns:
+            Словарь {запрос: ответ} с полями status ('found', 'ambiguous', 'fuzzy',
+            'not_found'), matches (все подходящие ФИО) и reply (текст для бота)
+        """
+        with metrics.traced('grid.search_people'):
+            snapshot = self._get_snapshot()
+            answers = {}
+            for search_query in queries:
+                if search_query in answers:
+                    continue
+                try:
+                    if search_query and snapshot is not None:
+                        answers[search_query] = self._answer(snapshot, search_query, fuzzy)
+                        continue
+                except Exception as e:
+                    print(f"Ошибка при поиске: {e}")
+                answers[search_query] = self._not_found(search_query)
+        return answers
+    
+    def get_many(self, queries: List[str], fuzzy: bool = False) -> Dict[str, str]:
+        """Получение расписаний нескольких сотрудников для бота: {запрос: текст}"""
+        return {
+            query: answer['reply']
+            for query, answer in self.search_people(queries, fuzzy=fuzzy).items()
+        }
     
     def format_schedule_for_bot(self, person_data: Dict) -> str:
         """Форматирование расписания для бота"""
@@ -289,7 +562,8 @@ class GridScheduler:
             if day not in person_data['schedule']:
                 continue
                 
-            result += f"{day_names[day]}:\n"
+            # Листы других дней недели тоже выводим, а не падаем на KeyError
+            result += f"{day_names.get(day, '📅 ' + day.capitalize())}:\n"
             
             schedule = person_data['schedule'][day]
             for item in schedule:
@@ -299,13 +573,154 @@ class GridScheduler:
         
         return result.strip()
 
+    def who_is_at(self, at, day: str = None, activity: str = None) -> Dict[str, List[str]]:
+        """
+        Кто чем занят в момент времени
+        
+        Args:
+            at: Время ("14:00" или datetime.time)
+            day: День недели; по умолчанию сегодня (ночью - предыдущий день)
+            activity: Часть названия активности для фильтра
+            
+        Returns:
+            Словарь {активность: [ФИО]}
+        """
+        snapshot = self._get_snapshot()
+        located = self._locate_slot(snapshot, at, day)
+        if located is None:
+            return {}
+        slots, slot = located
+        return slots.people([slot], self._activity_ids(snapshot, activity))
+    
+    def who_is_between(self, start, end, day: str = None,
+                       activity: str = None) -> Dict[str, List[str]]:
+        """
+        Кто чем занят в интервале времени [start, end)
+        
+        Args:
+            start: Начало интервала ("14:00" или datetime.time)
+            end: Конец интервала
+            day: День недели; по умолчанию сегодня
+            activity: Часть названия активности для фильтра
+            
+        Returns:
+            Словарь {активность: [ФИО]}
+        """
+        snapshot = self._get_snapshot()
+        start_minutes = time_to_minutes(start)
+        end_minutes = time_to_minutes(end)
+        if snapshot is None or start_minutes is None or end_minutes is None:
+            return {}
+        
+        slots = snapshot.slots.get((day or self._today()).lower())
+        if slots is None:
+            return {}
+        return slots.people(
+            slots.slots_between(start_minutes, end_minutes),
+            self._activity_ids(snapshot, activity)
+        )
+    
+    def who_is_free(self, at, day: str = None) -> List[str]:
+        """Кто свободен в момент времени (нет активности или она из GRID_FREE_ACTIVITIES)"""
+        snapshot = self._get_snapshot()
+        located = self._locate_slot(snapshot, at, day)
+        if located is None:
+            return []
+        slots, slot = located
+        return slots.free(slot, snapshot.free_activity_ids)
+    
+    def who_is_now(self, activity: str = None) -> Dict[str, List[str]]:
+        """Кто чем занят прямо сейчас"""
+        return self.who_is_at(datetime.datetime.now().time(), activity=activity)
+    
+    def _today(self) -> str:
+        """Название сегодняшнего дня недели"""
+        return WEEKDAYS[datetime.date.today().weekday()]
+    
+    def _locate_slot(self, snapshot: Optional[GridSnapshot], at, day: Optional[str]):
+        """Индекс дня и слот для момента времени"""
+        minutes = time_to_minutes(at)
+        if snapshot is None or minutes is None:
+            return None
+        
+        if day is not None:
+            candidates = [(day.lower(), minutes, True)]
+        else:
+            # Ночные слоты находятся в конце листа предыдущего дня
+            weekday = datetime.date.today().weekday()
+            candidates = [
+                (WEEKDAYS[weekday], minutes, False),
+                (WEEKDAYS[(weekday - 1) % 7], minutes + MINUTES_PER_DAY, False),
+            ]
+        
+        for day_name, day_minutes, unwrap in candidates:
+            slots = snapshot.slots.get(day_name)
+            slot = slots.slot_at(day_minutes, unwrap=unwrap) if slots else None
+            if slot is not None:
+                return slots, slot
+        return None
+    
+    def get_changes(self, since_version: int = None) -> Optional[Dict]:
+        """
+        Лента изменений: чьи расписания поменялись с указанной версии снимка
+        
+        Args:
+            since_version: Версия, с которой сравнивать (по умолчанию предыдущая)
+            
+        Returns:
+            Словарь с ключами from_version, to_version и changes - списком
+            {name, day, old, new}, где old/new - отрезки расписания дня или None,
+            если человека в этом листе не было. None, если версии уже нет в истории.
+        """
+        history = list(self._history)
+        if not history:
+            return None
+        new = history[-1]
+        if since_version is None:
+            if len(history) < 2:
+                return {'from_version': new.version, 'to_version': new.version, 'changes': []}
+            old = history[-2]
+        else:
+            old = next((snapshot for snapshot in history if snapshot.version == since_version), None)
+            if old is None:
+                print(f"Снимка версии {since_version} нет в истории")
+                return None
+        
+        changes = []
+        for name, day in diff_snapshots(old, new):
+            old_row = old.person_row(name, day)
+            new_row = new.person_row(name, day)
+            changes.append({
+                'name': str((new_row or old_row)[NAME_COLUMN]),
+                'day': day,
+                'old': self._extract_schedule(old_row, old.sheets[day]) if old_row else None,
+                'new': self._extract_schedule(new_row, new.sheets[day]) if new_row else None
+            })
+        return {'from_version': old.version, 'to_version': new.version, 'changes': changes}
+    
+    def _activity_ids(self, snapshot: GridSnapshot, activity: Optional[str]) -> Optional[Set[int]]:
+        """Номера активностей, в названии которых есть запрос"""
+        if activity is None:
+            return None
+        query = normalize_name(activity)
+        return {
+            activity_id for activity_id, name in enumerate(snapshot.activities.names)
+            if query in normalize_name(name)
+        }
+    
+    def _list_worksheets(self) -> List[gspread.Worksheet]:
+        """Запрос метаданных таблицы со списком листов"""
+        return self._executor.submit(self.spreadsheet.worksheets).result(
+            timeout=GRID_FETCH_TIMEOUT_SECONDS
+        )
+    
     def _get_days_from_sheets(self) -> List[str]:
         """Получение дней недели из названий листов"""
         if not self.spreadsheet:
             return self.days  # Возвращаем дни по умолчанию
         
         try:
-            all_worksheets = self.spreadsheet.worksheets()
+            all_worksheets = self._list_worksheets()
             found_days = []
             
             for worksheet in all_worksheets:
@@ -323,37 +738,49 @@ class GridScheduler:
                 if day in found_days and day not in unique_days:
                     unique_days.append(day)
             
-            return unique_days if unique_days else self.days
+            days = unique_days if unique_days else self.days
+            # Запоминаем листы, чтобы не запрашивать метаданные при каждой загрузке
+            self._worksheets = self._build_worksheet_directory(all_worksheets, days)
+            return days
             
         except Exception as e:
             print(f"Ошибка получения дней из листов: {e}")
             return self.days
     
-    def _get_worksheet_for_day(self, day: str):
-        """Получение листа для определенного дня недели"""
-        if not self.spreadsheet:
-            return None
-            
-        try:
-            all_worksheets = self.spreadsheet.worksheets()
-            
+    def _build_worksheet_directory(self, all_worksheets: List[gspread.Worksheet],
+                                   days: List[str]) -> Dict[str, gspread.Worksheet]:
+        """Сопоставление дней недели с листами таблицы"""
+        directory = {}
+        for day in days:
             for worksheet in all_worksheets:
-                worksheet_name = worksheet.title.lower()
-                if day in worksheet_name:
-                    return worksheet
-            
-            return None
-            
-        except Exception as e:
-            print(f"Ошибка получения листа для дня {day}: {e}")
-            return None
+                if day in worksheet.title.lower():
+                    directory[day] = worksheet
+                    break
+            else:
+                print(f"Лист для дня {day} не найден")
+        return directory
+    
+    def _get_worksheet_directory(self) -> Dict[str, gspread.Worksheet]:
+        """Справочник листов по дням; метаданные запрашиваются только если его нет"""
+        directory = self._worksheets
+        if directory is None:
+            directory = self._build_worksheet_directory(self._list_worksheets(), self.days)
+            self._worksheets = directory
+        return directory
+    
+    def _invalidate_worksheet_directory(self):
+        """Сброс справочника листов"""
+        self._worksheets = None
 
-def init_scheduler(spreadsheet_url: str = None, credentials_path: str = None):
+def init_scheduler(spreadsheet_url: str = None, credentials_path: str = None,
+                   snapshot_ttl: int = None, local_path: str = None):
     """Инициализация планировщика"""
     global scheduler
     scheduler = GridScheduler(
         spreadsheet_url=spreadsheet_url,
-        credentials_path=credentials_path
+        credentials_path=credentials_path,
+        snapshot_ttl=snapshot_ttl,
+        local_path=local_path
     )
     return scheduler
 
@@ -0,0 +1,165 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from grid.snapshot import DaySheet
+
+NAME_COLUMN = 'Организатор'
+
+
+def normalize_name(text) -> str:
+    """Приведение ФИО к виду для поиска: без регистра и с заменой ё на е"""
+    return str(text).casefold().replace('ё', 'е').strip()
+
+
+def _substrings(name: str) -> Set[str]:
+    """Все подстроки всех слов ФИО"""
+    return {
+        word[start:end]
+        for word in name.split()
+        for start in range(len(word))
+        for end in range(start + 1, len(word) + 1)
+    }
+
+
+class NameIndex:
+    """Индекс подстрок по столбцу «Организатор» всех дневных листов"""
+
+    def __init__(self):
+        # Нормализованное ФИО -> {день: номер первой строки с этим ФИО}
+        self.positions: Dict[str, Dict[str, int]] = {}
+        # Подстрока слова ФИО -> нормализованные ФИО, в которые она входит
+        self.substrings: Dict[str, Set[str]] = {}
+        # Нормализованное ФИО -> ФИО в том виде, как оно впервые встретилось в листах
+        self.display: Dict[str, str] = {}
+        # Подстроки, множества которых уже скопированы при пересборке (None - все свои)
+        self._owned: Optional[Set[str]] = None
+
+    @classmethod
+    def build(cls, sheets: Dict[str, 'DaySheet']) -> 'NameIndex':
+        """Построение индекса по листам организаторов"""
+        index = cls()
+        for day, sheet in sheets.items():
+            index._add_sheet(day, sheet)
+        return index
+
+    def rebuild_days(self, sheets: Dict[str, 'DaySheet'],
+                     days: Set[str]) -> Tuple['NameIndex', Set[str]]:
+        """
+        Новый индекс, в котором заново проиндексированы только листы days
+
+        Множества подстрок неизмененных ФИО общие со старым индексом и
+        копируются только при изменении.
+
+        Returns:
+            Кортеж (новый индекс, нормализованные ФИО, чьи строки изменились)
+        """
+        index = NameIndex()
+        index.positions = {name: dict(name_days) for name, name_days in self.positions.items()}
+        index.substrings = dict(self.substrings)
+        index.display = dict(self.display)
+        index._owned = set()
+
+        touched: Set[str] = set()
+        for name, name_days in index.positions.items():
+            for day in days:
+                if name_days.pop(day, None) is not None:
+                    touched.add(name)
+
+        for day in days:
+            if day in sheets:
+                index._add_sheet(day, sheets[day], touched)
+
+        for name in touched:
+            # Написание ФИО берем из первой строки с ним, как при полной сборке:
+            # в измененном листе могли поменяться регистр или ё/е
+            name_days = index.positions.get(name)
+            day = next((day for day in sheets if name_days and day in name_days), None)
+            if day is not None:
+                sheet = sheets[day]
+                index.display[name] = str(sheet.rows[name_days[day]].values[sheet.column_index[NAME_COLUMN]])
+
+        # ФИО, которых больше нет ни в одном листе, убираем из индекса
+        for name in touched:
+            if not index.positions.get(name):
+                index.positions.pop(name, None)
+                index.display.pop(name, None)
+                for substring in _substrings(name):
+                    names = index._substring_set(substring)
+                    names.discard(name)
+                    if not names:
+                        del index.substrings[substring]
+
+        index._owned = None
+        return index, touched
+
+    def _add_sheet(self, day: str, sheet: 'DaySheet', touched: Optional[Set[str]] = None):
+        """Добавление всех строк дневного листа"""
+        name_idx = sheet.column_index.get(NAME_COLUMN)
+        if name_idx is None:
+            print(f"В листе {day} нет столбца {NAME_COLUMN}")
+            return
+        for row_idx, row in enumerate(sheet.rows):
+            full_name = row.values[name_idx]
+            if full_name is None:
+                continue
+            name = normalize_name(full_name)
+            self._add(name, str(full_name), day, row_idx)
+            if touched is not None:
+                touched.add(name)
+
+    def _add(self, name: str, display: str, day: str, row_idx: int):
+        """Добавление строки листа в индекс"""
+        days = self.positions.get(name)
+        if days is None:
+            days = self.positions[name] = {}
+            self.display[name] = display
+            for substring in _substrings(name):
+                self._substring_set(substring).add(name)
+        days.setdefault(day, row_idx)
+
+    def _substring_set(self, substring: str) -> Set[str]:
+        """Изменяемое множество ФИО для подстроки (копия, если оно общее со старым индексом)"""
+        names = self.substrings.get(substring)
+        if names is None:
+            names = self.substrings[substring] = set()
+            if self._owned is not None:
+                self._owned.add(substring)
+        elif self._owned is not None and substring not in self._owned:
+            names = self.substrings[substring] = set(names)
+            self._owned.add(substring)
+        return names
+
+    def candidates(self, search_query: str) -> Iterable[str]:
+        """ФИО, в которых каждое слово запроса входит в одно из слов как подстрока"""
+        search_words = normalize_name(search_query).split()
+        if not search_words:
+            return self.positions.keys()
+
+        # Начинаем с самого редкого слова, чтобы пересечение было минимальным
+        sets = sorted((self.substrings.get(word, set()) for word in search_words), key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            result = result & other
+        return result
+
+    def lookup(self, search_query: str,
+               candidates: Optional[Iterable[str]] = None) -> Dict[str, Tuple[int, str]]:
+        """
+        Поиск строк, подходящих под запрос
+
+        Args:
+            search_query: Поисковый запрос
+            candidates: Уже найденные candidates(search_query), если есть
+
+        Returns:
+            Словарь {день: (номер первой подходящей строки листа, нормализованное ФИО)}
+        """
+        if candidates is None:
+            candidates = self.candidates(search_query)
+        rows: Dict[str, Tuple[int, str]] = {}
+        for name in candidates:
+            for day, row_idx in self.positions[name].items():
+                current: Optional[Tuple[int, str]] = rows.get(day)
+                if current is None or row_idx < current[0]:
+                    rows[day] = (row_idx, name)
+        return rows
@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right
+from datetime import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set
+
+from grid.index import NAME_COLUMN
+
+if TYPE_CHECKING:
+    from grid.snapshot import DaySheet
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def time_to_minutes(value) -> Optional[int]:
+    """Перевод "14:30" или datetime.time в минуты от полуночи"""
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    try:
+        hours, minutes = map(int, str(value).strip().split(':')[:2])
+    except ValueError:
+        return None
+    return hours * 60 + minutes
+
+
+class SlotIndex:
+    """Индекс «слот времени -> активность -> строки» одного дневного листа"""
+
+    def __init__(self, sheet: 'DaySheet'):
+        self.sheet = sheet
+        # Начало каждого слота в минутах; после полуночи время продолжает расти
+        self.minutes: List[int] = []
+        offset = 0
+        for column in sheet.time_columns:
+            value = time_to_minutes(column)
+            if value is None:
+                value = self.minutes[-1] if self.minutes else 0
+            if self.minutes and value + offset < self.minutes[-1]:
+                offset += MINUTES_PER_DAY
+            self.minutes.append(value + offset)
+
+        # Для каждого слота: id активности -> номера строк
+        self.slots: List[Dict[int, List[int]]] = [{} for _ in self.minutes]
+        self.names: Dict[int, str] = {}
+        for row_idx, row in enumerate(sheet.rows):
+            name = row.get(NAME_COLUMN)
+            if name is None or not str(name).strip():
+                continue
+            self.names[row_idx] = str(name)
+            for start, end, activity_id in row.segments:
+                stop = len(self.minutes) if end is None else end
+                for slot in range(start, stop):
+                    self.slots[slot].setdefault(activity_id, []).append(row_idx)
+
+    def _slot_end(self, slot: int) -> int:
+        """Конец слота: начало следующего или длина предпоследнего слота"""
+        if slot + 1 < len(self.minutes):
+            return self.minutes[slot + 1]
+        if len(self.minutes) > 1:
+            return self.minutes[slot] + self.minutes[-1] - self.minutes[-2]
+        return self.minutes[slot] + 30
+
+    def _unwrap(self, minutes: int) -> int:
+        """Время после полуночи относится к концу листа, если лист до него доходит"""
+        if (self.minutes and minutes < self.minutes[0] and
+                minutes + MINUTES_PER_DAY < self._slot_end(len(self.minutes) - 1)):
+            return minutes + MINUTES_PER_DAY
+        return minutes
+
+    def slot_at(self, minutes: int, unwrap: bool = True) -> Optional[int]:
+        """
+        Слот, содержащий момент времени, или None если он вне листа
+
+        Args:
+            minutes: Минуты от полуночи дня листа
+            unwrap: Считать раннее время ночью после этого дня
+        """
+        if not self.minutes:
+            return None
+        if unwrap:
+            minutes = self._unwrap(minutes)
+        slot = bisect_right(self.minutes, minutes) - 1
+        if slot < 0 or minutes >= self._slot_end(slot):
+            return None
+        return slot
+
+    def slots_between(self, start: int, end: int) -> range:
+        """Слоты, пересекающиеся с интервалом [start, end)"""
+        if not self.minutes:
+            return range(0)
+        start = self._unwrap(start)
+        end = self._unwrap(end)
+        if end <= start:
+            end += MINUTES_PER_DAY
+        first = max(bisect_right(self.minutes, start) - 1, 0)
+        if self._slot_end(first) <= start:
+            first += 1
+        return range(first, bisect_left(self.minutes, end))
+
+    def people(self, slots: Iterable[int],
+               activity_ids: Optional[Set[int]] = None) -> Dict[str, List[str]]:
+        """Кто чем занят в указанных слотах: {активность: [ФИО]}"""
+        activity_names = self.sheet.activities.names
+        rows_by_activity: Dict[int, Dict[int, None]] = {}
+        for slot in slots:
+            for activity_id, rows in self.slots[slot].items():
+                if activity_ids is None or activity_id in activity_ids:
+                    rows_by_activity.setdefault(activity_id, {}).update(dict.fromkeys(rows))
+
+        result: Dict[str, Dict[str, None]] = {}
+        for activity_id, rows in rows_by_activity.items():
+            names = result.setdefault(activity_names[activity_id], {})
+            names.update(dict.fromkeys(self.names[row_idx] for row_idx in rows))
+        return {activity: list(names) for activity, names in result.items()}
+
+    def free(self, slot: int, free_activity_ids: Set[int]) -> List[str]:
+        """Кто свободен в слоте: нет активности или активность из списка свободных"""
+        busy = {
+            row_idx
+            for activity_id, rows in self.slots[slot].items()
+            if activity_id not in free_activity_ids
+            for row_idx in rows
+        }
+        return list(dict.fromkeys(
+            name for row_idx, name in self.names.items() if row_idx not in busy
+        ))
@@ -0,0 +1,422 @@
+import datetime
+import sys
+from concurrent.futures import Executor, wait
+from datetime import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from gspread.utils import absolute_range_name, fill_gaps, numericise
+
+from config import GRID_FREE_ACTIVITIES
+from common import metrics, store
+from grid.fuzzy import FuzzyIndex
+from grid.index import NAME_COLUMN, NameIndex, normalize_name
+from grid.intervals import SlotIndex
+
+
+# Отрезок расписания: (начальный слот, слот окончания или None, id активности)
+Segment = Tuple[int, Optional[int], int]
+# Нормализованные названия активностей, при которых организатор свободен
+FREE_ACTIVITIES = frozenset(normalize_name(name) for name in GRID_FREE_ACTIVITIES)
+# Во сколько раз таблица активностей может вырасти при инкрементальных сборках
+# по сравнению с последней полной; дальше снимок собирается заново
+ACTIVITY_TABLE_GROWTH = 2
+
+
+class ActivityTable:
+    """Интернированные названия активностей: каждое хранится один раз на снимок"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # Размер таблицы после последней полной сборки снимка
+        self.full_size = 0
+
+    def id(self, name: str) -> int:
+        """Номер активности (новые названия добавляются в таблицу)"""
+        activity_id = self._ids.get(name)
+        if activity_id is None:
+            activity_id = self._ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return activity_id
+
+    def copy(self) -> 'ActivityTable':
+        """Копия с теми же номерами: новые названия не попадают в исходную таблицу"""
+        table = ActivityTable()
+        table.names = list(self.names)
+        table._ids = dict(self._ids)
+        table.full_size = self.full_size
+        return table
+
+
+class GridRow:
+    """Строка дневного листа: данные организатора и отрезки его расписания"""
+
+    __slots__ = ('values', 'columns', 'segments')
+
+    def __init__(self, values: tuple, columns: Dict[str, int], segments: Tuple[Segment, ...]):
+        """
+        Args:
+            values: Значения нетабличных ячеек строки (ФИО, телефон, должность...)
+            columns: Общий для листа словарь {заголовок: номер значения}
+            segments: Соседние одинаковые активности, объединенные в отрезки
+        """
+        self.values = values
+        self.columns = columns
+        self.segments = segments
+
+    def get(self, column, default: Any = None) -> Any:
+        """Значение ячейки по заголовку столбца"""
+        idx = self.columns.get(column)
+        if idx is None:
+            return default
+        return self.values[idx]
+
+    def __getitem__(self, column) -> Any:
+        return self.values[self.columns[column]]
+
+
+class DaySheet:
+    """Дневной лист сетки: заголовки, временные слоты и строки организаторов"""
+
+    __slots__ = ('columns', 'column_index', 'time_columns', 'rows', 'activities')
+
+    def __init__(self, columns: List[str], column_index: Dict[str, int],
+                 time_columns: List[str], rows: List[GridRow], activities: ActivityTable):
+        self.columns = columns
+        self.column_index = column_index
+        self.time_columns = time_columns
+        self.rows = rows
+        self.activities = activities
+
+
+class GridSnapshot:
+    """Снимок всех дневных листов сетки, распарсенный в памяти"""
+
+    def __init__(self, sheets: Dict[str, DaySheet], version: int,
+                 loaded_at: Optional[datetime.datetime] = None,
+                 activities: Optional[ActivityTable] = None,
+                 fingerprints: Optional[Dict[str, str]] = None,
+                 previous: Optional['GridSnapshot'] = None):
+        """
+        Args:
+            sheets: Лист организаторов для каждого дня недели
+            version: Порядковый номер снимка
+            loaded_at: Время загрузки данных из Google Sheets
+            activities: Общая для всех листов таблица активностей
+            fingerprints: Отпечатки значений каждого дневного листа
+            previous: Прошлый снимок, индексы которого пересобираются
+                только для изменившихся листов
+        """
+        self.sheets = sheets
+        self.version = version
+        self.activities = activities or ActivityTable()
+        self.fingerprints = fingerprints or {}
+        self.loaded_at = loaded_at or datetime.datetime.now()
+        # Номера активностей из GRID_FREE_ACTIVITIES (таблица снимка после сборки не меняется)
+        self.free_activity_ids = frozenset(
+            activity_id for activity_id, name in enumerate(self.activities.names)
+            if normalize_name(name) in FREE_ACTIVITIES
+        )
+
+        if previous is None:
+            # Полная сборка: все листы и все ФИО считаются изменившимися
+            self.changed_days: Set[str] = set(sheets)
+            self.index = NameIndex.build(sheets)
+            self.touched_names: Set[str] = set(self.index.positions)
+            self.fuzzy = FuzzyIndex(self.index)
+            # Индекс «кто где» по временным слотам каждого дня
+            self.slots = {day: SlotIndex(sheet) for day, sheet in sheets.items()}
+            # Отпечатки расписаний: день -> {нормализованное ФИО: хеш отрезков}
+            self.schedule_hashes = {day: _hash_schedules(sheet) for day, sheet in sheets.items()}
+            return
+
+        self.changed_days = {
+            day for day in set(sheets) | set(previous.sheets)
+            if sheets.get(day) is not previous.sheets.get(day)
+        }
+        self.index, touched = previous.index.rebuild_days(sheets, self.changed_days)
+        self.touched_names = self._changed_names(previous, touched)
+        if self.index.positions.keys() == previous.index.positions.keys():
+            self.fuzzy = previous.fuzzy
+        else:
+            self.fuzzy = FuzzyIndex(self.index)
+        self.slots = {
+            day: SlotIndex(sheet) if day in self.changed_days else previous.slots[day]
+            for day, sheet in sheets.items()
+        }
+        self.schedule_hashes = {
+            day: _hash_schedules(sheet) if day in self.changed_days else previous.schedule_hashes[day]
+            for day, sheet in sheets.items()
+        }
+
+    def _changed_names(self, previous: 'GridSnapshot', names: Set[str]) -> Set[str]:
+        """ФИО из names, строки которых в изменившихся листах действительно другие"""
+        changed = set()
+        for name in names:
+            old_days = previous.index.positions.get(name)
+            new_days = self.index.positions.get(name)
+            if old_days is None or new_days is None or old_days.keys() != new_days.keys():
+                changed.add(name)
+                continue
+            for day in self.changed_days & new_days.keys():
+                old_sheet, new_sheet = previous.sheets[day], self.sheets[day]
+                old_row = old_sheet.rows[old_days[day]]
+                new_row = new_sheet.rows[new_days[day]]
+                if (old_sheet.columns != new_sheet.columns or
+                        old_row.values != new_row.values or
+                        old_row.segments != new_row.segments):
+                    changed.add(name)
+                    break
+        return changed
+
+    def person_row(self, name: str, day: str) -> Optional[GridRow]:
+        """Первая строка организатора в листе дня или None"""
+        row_idx = self.index.positions.get(name, {}).get(day)
+        if row_idx is None:
+            return None
+        return self.sheets[day].rows[row_idx]
+
+    def age(self) -> float:
+        """Возраст снимка в секундах"""
+        return (datetime.datetime.now() - self.loaded_at).total_seconds()
+
+
+class _CellParser:
+    """Преобразование ячеек как в get_all_records с кешем по значению
+
+    Активности повторяются в сотнях ячеек, поэтому каждая уникальная строка
+    разбирается и интернируется один раз.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Any] = {}
+
+    def __call__(self, value: str) -> Any:
+        parsed = self._cache.get(value)
+        if parsed is None:
+            parsed = numericise(value)
+            if isinstance(parsed, str):
+                parsed = sys.intern(parsed)
+            self._cache[value] = parsed
+        return parsed
+
+
+def _is_time_column(column) -> bool:
+    """Столбец со временем начала слота (например, "9:30")"""
+    return isinstance(column, time) or ':' in str(column)
+
+
+def _encode_segments(cells: List[Any], activities: ActivityTable) -> Tuple[Segment, ...]:
+    """Объединение соседних одинаковых активностей в отрезки (пустые ячейки пропускаются)"""
+    segments = []
+    start = None
+    current = None
+    for slot, value in enumerate(cells):
+        if value is None:
+            continue
+        activity = str(value).strip()
+        if not activity or activity == current:
+            continue
+        if current is not None:
+            segments.append((start, slot, activities.id(current)))
+        start = slot
+        current = activity
+
+    if current is not None:
+        segments.append((start, None, activities.id(current)))
+    return tuple(segments)
+
+
+def _build_sheet(values: List[List[str]], activities: ActivityTable,
+                 parse_cell: _CellParser) -> Optional[DaySheet]:
+    """Преобразование значений листа в строки (как worksheet.get_all_records)"""
+    if not values:
+        return DaySheet([], {}, [], [], activities)
+
+    values = fill_gaps(values)
+    headers = values[0]
+    if len(set(headers)) != len(headers):
+        print(f"В строке заголовков есть дубликаты: {headers}")
+        return None
+
+    # Временные столбцы берем в порядке следования в таблице, без сортировки
+    time_idx = [idx for idx, header in enumerate(headers) if _is_time_column(header)]
+    info_idx = [idx for idx, header in enumerate(headers) if not _is_time_column(header)]
+    column_index = {headers[idx]: pos for pos, idx in enumerate(info_idx)}
+
+    rows = []
+    for raw_row in values[1:]:
+        row = [parse_cell(value) for value in raw_row]
+        rows.append(GridRow(
+            tuple(row[idx] for idx in info_idx),
+            column_index,
+            _encode_segments([row[idx] for idx in time_idx], activities)
+        ))
+
+    return DaySheet(headers, column_index, [headers[idx] for idx in time_idx], rows, activities)
+
+
+def _hash_schedules(sheet: DaySheet) -> Dict[str, str]:
+    """Хеши расписаний первой строки каждого организатора листа (по времени и названиям)"""
+    name_idx = sheet.column_index.get(NAME_COLUMN)
+    if name_idx is None:
+        return {}
+    time_columns = sheet.time_columns
+    activity_names = sheet.activities.names
+    hashes = {}
+    for row in sheet.rows:
+        full_name = row.values[name_idx]
+        if full_name is None:
+            continue
+        name = normalize_name(full_name)
+        if name in hashes:
+            continue
+        hashes[name] = store.fingerprint([
+            [str(time_columns[start]), None if end is None else str(time_columns[end]),
+             activity_names[activity_id]]
+            for start, end, activity_id in row.segments
+        ])
+    return hashes
+
+
+def diff_snapshots(old: GridSnapshot, new: GridSnapshot) -> List[Tuple[str, str]]:
+    """
+    Организаторы, расписание которых отличается между двумя снимками
+
+    Сравниваются только хеши расписаний; листы, общие для обоих снимков,
+    пропускаются целиком.
+
+    Returns:
+        Список (нормализованное ФИО, день) в порядке листов нового снимка
+    """
+    changed = []
+    for day in dict.fromkeys(list(new.sheets) + list(old.sheets)):
+        old_hashes = old.schedule_hashes.get(day, {})
+        new_hashes = new.schedule_hashes.get(day, {})
+        if old_hashes is new_hashes:
+            continue
+        for name in dict.fromkeys(list(new_hashes) + list(old_hashes)):
+            if old_hashes.get(name) != new_hashes.get(name):
+                changed.append((name, day))
+    return changed
+
+
+def fetch_day_values(spreadsheet, day_worksheets: Dict[str, object],
+                     executor: Optional[Executor] = None,
+                     timeout: Optional[float] = None) -> Dict[str, List[List[str]]]:
+    """
+    Загрузка значений всех дневных листов одним запросом values:batchGet
+
+    Если пакетный запрос не удался, листы загружаются по отдельности
+    параллельно через executor.
+
+    Args:
+        spreadsheet: Открытая таблица gspread
+        day_worksheets: Листы таблицы для каждого дня недели
+        executor: Пул потоков для параллельной загрузки листов
+        timeout: Предельное время ожидания всех листов в секундах
+
+    Returns:
+        Словарь {день: значения листа}
+    """
+    if not day_worksheets:
+        return {}
+
+    ranges = [absolute_range_name(worksheet.title) for worksheet in day_worksheets.values()]
+    try:
+        response = spreadsheet.values_batch_get(ranges)
+    except Exception as e:
+        if executor is None:
+            raise
+        print(f"Ошибка пакетной загрузки листов: {e}, загружаем по отдельности")
+        return fetch_day_values_concurrently(day_worksheets, executor, timeout)
+
+    value_ranges = response.get('valueRanges', [])
+    return {
+        day: value_range.get('values', [])
+        for day, value_range in zip(day_worksheets, value_ranges)
+    }
+
+
+def fetch_day_values_concurrently(day_worksheets: Dict[str, object], executor: Executor,
+                                  timeout: Optional[float] = None) -> Dict[str, List[List[str]]]:
+    """
+    Параллельная загрузка дневных листов по одному запросу на лист
+
+    Общая задержка примерно равна задержке самого медленного листа,
+    число одновременных запросов ограничено размером пула. Листы, которые
+    не удалось загрузить, в результат не попадают.
+
+    Raises:
+        TimeoutError: Не все листы загрузились за timeout секунд (общий срок
+            на все листы); незавершенные запросы отменяются
+    """
+    futures = {
+        day: executor.submit(worksheet.get_all_values)
+        for day, worksheet in day_worksheets.items()
+    }
+
+    _, not_done = wait(futures.values(), timeout=timeout)
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        late = [day for day, future in futures.items() if future in not_done]
+        raise TimeoutError(f"Листы не загружены за {timeout} с: {', '.join(late)}")
+
+    day_values = {}
+    for day, future in futures.items():
+        try:
+            day_values[day] = future.result()
+        except Exception as e:
+            print(f"Ошибка загрузки листа {day}: {e}")
+    return day_values
+
+
+def build_snapshot(day_values: Dict[str, List[List[str]]], version: int,
+                   loaded_at: Optional[datetime.datetime] = None,
+                   previous: Optional[GridSnapshot] = None) -> GridSnapshot:
+    """
+    Разбор значений дневных листов в снимок
+
+    Листы, значения которых не изменились с прошлого снимка, не разбираются
+    заново: их строки и индексы берутся из previous.
+
+    Args:
+        day_values: Словарь {день: значения листа}
+        version: Номер создаваемого снимка
+        loaded_at: Время загрузки значений из Google Sheets
+        previous: Прошлый снимок сетки, если есть
+
+    Returns:
+        Новый снимок сетки
+    """
+    fingerprints = {day: store.fingerprint(values) for day, values in day_values.items()}
+    if previous is not None and not any(
+            previous.fingerprints.get(day) == value for day, value in fingerprints.items()):
+        # Изменились все листы - переиспользовать нечего
+        previous = None
+    elif (previous is not None and
+          len(previous.activities.names) > ACTIVITY_TABLE_GROWTH * max(previous.activities.full_size, 1)):
+        # В таблице накопились названия, которых, возможно, уже нет в листах
+        previous = None
+
+    sheets = {}
+    # Новые листы дописывают активности в копию прошлой таблицы: id в старых
+    # листах не меняются, а читатели прошлого снимка видят его таблицу неизменной.
+    # Полная сборка начинает с пустой таблицы, и забытые названия уходят
+    activities = previous.activities.copy() if previous is not None else ActivityTable()
+    parse_cell = _CellParser()
+    with metrics.stage('grid.parse'):
+        for day, values in day_values.items():
+            if previous is not None and previous.fingerprints.get(day) == fingerprints[day]:
+                sheet = previous.sheets.get(day)
+                metrics.inc('rim_parse_skipped_total', source='grid')
+            else:
+                sheet = _build_sheet(values, activities, parse_cell)
+            if sheet is not None:
+                sheets[day] = sheet
+
+    if previous is None:
+        activities.full_size = len(activities.names)
+    with metrics.stage('grid.index'):
+        return GridSnapshot(sheets, version, loaded_at, activities, fingerprints, previous)
@@ -0,0 +1,72 @@
+"""
+Легкий клиент демона rim_bot (python -m service.daemon)
+
+Импортирует только стандартную библиотеку, поэтому отвечает за миллисекунды:
+
+    python rim_client.py Будай
+    python rim_client.py /calendar 3
+    python rim_client.py --status
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Тот же путь по умолчанию, что и DAEMON_SOCKET_PATH в config.py (config не импортируется)
+DEFAULT_SOCKET_PATH = os.getenv("DAEMON_SOCKET_PATH", os.path.join(tempfile.gettempdir(), "rim_bot.sock"))
+
+
+def request(payload, socket_path=DEFAULT_SOCKET_PATH, timeout=30.0):
+    """Отправка одного запроса демону и получение ответа"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b'\n'):
+                break
+    return json.loads(b''.join(chunks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запрос к демону rim_bot")
+    parser.add_argument('text', nargs='*', help="Фамилия, \"Фамилия Имя\" или команда (/calendar 3)")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help="Путь к сокету демона")
+    parser.add_argument('--status', action='store_true', help="Состояние кешей демона")
+    parser.add_argument('--metrics', action='store_true', help="Метрики в формате Prometheus")
+    parser.add_argument('--changes', nargs='?', const=-1, type=int, metavar='VERSION',
+                        help="Изменения расписаний с версии снимка (по умолчанию с предыдущей)")
+    parser.add_argument('--json', action='store_true', help="Вывести ответ демона как есть")
+    args = parser.parse_args()
+
+    if args.status:
+        payload = {'command': 'status'}
+    elif args.metrics:
+        payload = {'command': 'metrics'}
+    elif args.changes is not None:
+        payload = {'command': 'changes', 'since': None if args.changes < 0 else args.changes}
+    else:
+        payload = {'text': ' '.join(args.text)}
+
+    try:
+        response = request(payload, args.socket)
+    except OSError as e:
+        print(f"Демон недоступен ({args.socket}): {e}", file=sys.stderr)
+        return 2
+
+    if args.json or 'reply' not in response:
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+    else:
+        print(response['reply'])
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
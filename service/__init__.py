@@ -0,0 +1,2 @@
+from .service import QueryService
+from .transport import FakeChatTransport
@@ -0,0 +1,169 @@
+"""
+Демон с загруженными в память календарем и сеткой: python -m service.daemon
+
+Запросы принимаются по Unix-сокету DAEMON_SOCKET_PATH, по одному JSON-объекту
+на строку, ответ - тоже одна строка JSON:
+
+    {"text": "Будай"}                  -> {"ok": true, "reply": "..."}
+    {"command": "calendar", "days": 3} -> {"ok": true, "reply": "..."}
+    {"command": "grid", "query": "Будай", "fuzzy": false}
+    {"command": "changes", "since": 5} -> {"ok": true, "changes": {...}}
+    {"command": "status"} / {"command": "metrics"}
+
+Для запросов из скриптов и cron есть легкий клиент rim_client.py.
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from config import DAEMON_SOCKET_PATH, GRID_CREDENTIALS_PATH
+from common import metrics
+from service.service import QueryService
+
+# Максимальная длина строки запроса в байтах
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+async def _dispatch(service: QueryService, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполнение одного запроса клиента"""
+    command = request.get('command', 'text')
+    if command == 'text':
+        return {'ok': True, 'reply': await service.handle(str(request.get('text', '')))}
+    if command == 'calendar':
+        return {'ok': True, 'reply': await service.calendar(int(request.get('days', 7)))}
+    if command == 'grid':
+        query = str(request.get('query', ''))
+        if 'fuzzy' in request:
+            reply = await service.schedule(query, bool(request['fuzzy']))
+        else:
+            reply = await service.schedule(query)
+        return {'ok': True, 'reply': reply}
+    if command == 'changes':
+        since = request.get('since')
+        return {'ok': True, 'changes': await service.changes(int(since) if since is not None else None)}
+    if command == 'status':
+        return {'ok': True, 'status': service.status()}
+    if command == 'metrics':
+        if request.get('format') == 'json':
+            return {'ok': True, 'metrics': metrics.export_json()}
+        return {'ok': True, 'reply': metrics.export_prometheus()}
+    return {'ok': False, 'error': f"Неизвестная команда: {command}"}
+
+
+def _connection_handler(service: QueryService):
+    async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    response = {'ok': False, 'error': "Слишком длинный запрос"}
+                    line = None
+                else:
+                    if not line:
+                        break
+                    try:
+                        response = await _dispatch(service, json.loads(line))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        response = {'ok': False, 'error': f"Некорректный запрос: {e}"}
+                    except Exception as e:
+                        print(f"Ошибка обработки запроса: {e}")
+                        response = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+                await writer.drain()
+                if line is None:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    return handle_connection
+
+
+def _remove_stale_socket(path: str):
+    """Удаление сокета, оставшегося от упавшего демона; работающий демон не трогаем"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f"Демон уже запущен: {path}")
+    finally:
+        probe.close()
+
+
+async def serve(service: QueryService, socket_path: str = DAEMON_SOCKET_PATH,
+                stop: Optional[asyncio.Event] = None):
+    """
+    Обслуживание клиентов по Unix-сокету
+
+    Args:
+        service: Сервис запросов
+        socket_path: Путь к сокету (доступен только владельцу процесса)
+        stop: Событие остановки; по умолчанию демон работает до SIGINT/SIGTERM
+    """
+    server = await asyncio.start_unix_server(
+        _connection_handler(service), path=socket_path, limit=MAX_REQUEST_BYTES
+    )
+    os.chmod(socket_path, 0o600)
+
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+    print(f"Демон слушает {socket_path}")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        service.close()
+        print("Демон остановлен")
+
+
+def main():
+    from calendar_events import restore_snapshot
+    from grid import init_scheduler
+
+    try:
+        _remove_stale_socket(DAEMON_SOCKET_PATH)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    # Сохраненный календарь доступен сразу, до загрузки из таблицы
+    restore_snapshot()
+    scheduler = init_scheduler(
+        spreadsheet_url=os.getenv("SPREADSHEET_URL"),
+        credentials_path=GRID_CREDENTIALS_PATH
+    )
+    service = QueryService(scheduler)
+
+    async def run():
+        await service.warm_up()
+        await serve(service)
+
+    try:
+        asyncio.run(run())
+    finally:
+        scheduler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+from config import SERVICE_WORKERS, SERVICE_GRID_FUZZY, SERVICE_MAX_CALENDAR_DAYS
+from common import metrics
+
+HELP_TEXT = (
+    "Команды:\n"
+    "/calendar [дней] - события на ближайшие дни\n"
+    "Фамилия или Фамилия Имя - расписание организатора"
+)
+
+
+class QueryService:
+    """Асинхронный слой над календарем и сеткой для чат-бота
+
+    Блокирующие запросы выполняются в пуле потоков, чтобы не останавливать
+    цикл событий. Одинаковые запросы, пришедшие пока первый еще выполняется,
+    ждут его результата, а не идут в Google Sheets повторно.
+    """
+
+    def __init__(self, scheduler=None, calendar_get: Callable[..., str] = None,
+                 max_workers: int = None, calendar_load: Callable[[], Any] = None):
+        """
+        Args:
+            scheduler: GridScheduler для поиска расписаний (None - только календарь)
+            calendar_get: Функция календаря (по умолчанию calendar_events.get)
+            max_workers: Размер пула потоков для блокирующих запросов
+            calendar_load: Загрузка данных календаря без ответа
+                (по умолчанию calendar_events.calendar.get_events_data)
+        """
+        if calendar_get is None:
+            from calendar_events import get as calendar_get
+        if calendar_load is None:
+            from calendar_events.calendar import get_events_data as calendar_load
+        self.scheduler = scheduler
+        self._calendar_get = calendar_get
+        self._calendar_load = calendar_load
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or SERVICE_WORKERS, thread_name_prefix='query'
+        )
+        # Ключ запроса -> выполняющийся запрос
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _coalesced(self, key: Hashable, func: Callable[..., Any], *args) -> Any:
+        """Выполнение func(*args) в пуле; одинаковые одновременные запросы разделяют результат"""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.inc('rim_service_coalesced_total', kind=key[0])
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(future)
+
+    async def calendar(self, days_ahead: int = 7) -> str:
+        """События календаря на days_ahead дней (от 1 до SERVICE_MAX_CALENDAR_DAYS)"""
+        days_ahead = max(1, min(days_ahead, SERVICE_MAX_CALENDAR_DAYS))
+        return await self._coalesced(('calendar', days_ahead), self._calendar_get, days_ahead)
+
+    async def schedule(self, search_query: str, fuzzy: bool = SERVICE_GRID_FUZZY) -> str:
+        """Расписание организатора из сетки"""
+        if self.scheduler is None:
+            return "Сетка не подключена"
+        return await self._coalesced(('grid', search_query, fuzzy), self.scheduler.get, search_query, fuzzy)
+
+    async def changes(self, since_version: Optional[int] = None) -> Optional[Dict]:
+        """Лента изменений расписаний сетки (см. GridScheduler.get_changes)"""
+        if self.scheduler is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.scheduler.get_changes, since_version
+        )
+
+    async def warm_up(self):
+        """Загрузка календаря и снимка сетки до первого запроса"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._calendar_load)
+        except Exception as e:
+            print(f"Календарь не загружен при старте: {e}")
+        if self.scheduler is not None:
+            if not await loop.run_in_executor(self._executor, self.scheduler.load):
+                print("Сетка не загружена при старте")
+
+    def status(self) -> Dict[str, Any]:
+        """Состояние кешей календаря и сетки и использование квоты Sheets"""
+        from calendar_events.calendar import get_refresh_status
+        from common.sheets import get_quota_stats
+        return {
+            'calendar': get_refresh_status(),
+            'grid': self.scheduler.get_refresh_status() if self.scheduler is not None else None,
+            'quota': get_quota_stats(),
+            'in_flight': len(self._in_flight),
+        }
+
+    async def handle(self, text: str) -> str:
+        """Ответ на сообщение пользователя"""
+        text = (text or '').strip()
+        command, _, argument = text.partition(' ')
+        command = command.split('@')[0].lower()
+        if command in ('/start', '/help'):
+            return HELP_TEXT
+        if command in ('/calendar', 'календарь'):
+            days_ahead = int(argument) if argument.strip().isdigit() else 7
+            return await self.calendar(days_ahead)
+        if command == '/grid':
+            text = argument
+        return await self.schedule(text)
+
+    async def _reply(self, transport, chat_id: Any, text: str):
+        try:
+            with metrics.stage('service.handle'):
+                answer = await self.handle(text)
+        except Exception as e:
+            print(f"Ошибка обработки сообщения {text!r}: {e}")
+            answer = "Ошибка: не удалось получить данные, попробуйте позже"
+        await transport.send(chat_id, answer)
+
+    async def serve(self, transport):
+        """
+        Обработка сообщений транспорта, пока он не закроется
+
+        Каждое сообщение обрабатывается в своей задаче, поэтому медленный
+        запрос одного пользователя не задерживает ответы остальным.
+        """
+        while True:
+            message = await transport.receive()
+            if message is None:
+                break
+            chat_id, text = message
+            task = asyncio.create_task(self._reply(transport, chat_id, text))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    def close(self):
+        """Остановка пула потоков"""
+        self._executor.shutdown(wait=False)
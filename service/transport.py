@@ -0,0 +1,30 @@
+import asyncio
+from typing import Any, List, Optional, Tuple
+
+
+class FakeChatTransport:
+    """Транспорт чата в памяти для локальной проверки QueryService
+
+    Сообщения кладутся через post(), ответы копятся в sent.
+    Транспорт настоящего бота должен предоставлять те же receive() и send().
+    """
+
+    def __init__(self):
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self.sent: List[Tuple[Any, str]] = []
+
+    def post(self, chat_id: Any, text: str):
+        """Сообщение от пользователя"""
+        self._incoming.put_nowait((chat_id, text))
+
+    def close(self):
+        """Больше сообщений не будет: serve() завершится после текущих"""
+        self._incoming.put_nowait(None)
+
+    async def receive(self) -> Optional[Tuple[Any, str]]:
+        """Следующее сообщение или None, если транспорт закрыт"""
+        return await self._incoming.get()
+
+    async def send(self, chat_id: Any, text: str):
+        """Ответ пользователю"""
+        self.sent.append((chat_id, text))
@@ -0,0 +1,122 @@
+"""
+Разбор календаря: поиск комбинаций проектов, индекс событий по проектам
+и объединение нескольких листов
+"""
+import datetime
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import make_calendar
+from calendar_events.calendar import (
+    COMBINATION_STOP_WORDS, _ProjectMatcher, _parse_worksheets, _start_years,
+    merge_calendars, parse_calendar_data
+)
+from config import CALENDAR_START_YEAR, _parse_calendar_worksheets
+
+
+def _is_combination(event_text, project_name, projects):
+    """Прежняя проверка: перебор всех проектов для каждой ячейки"""
+    for project in projects:
+        if (project.lower() in event_text.lower() and
+            project.lower() != project_name.lower() and
+            not any(keyword.lower() in event_text.lower() for keyword in COMBINATION_STOP_WORDS)):
+            return True
+    return False
+
+
+def test_matcher_matches_substring_scan():
+    for seed in range(3):
+        rows = make_calendar(months=2, projects=40, seed=seed)
+        projects = {row[0] for row in rows if row and row[0]} | {"АША'25", 'РИМ', 'Ёлка', 'ПРОЕКТ1'}
+        matcher = _ProjectMatcher(projects)
+        for row in rows:
+            for cell in row[1:]:
+                if '+' not in cell:
+                    continue
+                for project in (row[0], 'Проект1', 'РИМ'):
+                    expected = _is_combination(cell, project, projects)
+                    event_lower = cell.lower()
+                    actual = (not any(keyword in event_lower for keyword in COMBINATION_STOP_WORDS)
+                              and matcher.contains_other(event_lower, project.lower()))
+                    assert actual == expected, (cell, project)
+
+
+def test_shared_event_indexed_for_each_project():
+    rows = [
+        ['ЯНВАРЬ'] + [''] * 7,
+        ['', 'ПН', 'ВТ', 'СР', 'ЧТ', 'ПТ', 'СБ', 'ВС'],
+        ['', '1', '2', '3', '4', '5', '6', '7'],
+        ['Альфа', 'Альфа + Бета', 'сбор', '', '', '', '', ''],
+        ['Бета', 'Альфа + Бета', '', '', '', '', '', ''],
+    ]
+    data = parse_calendar_data(rows, start_year=2026)
+    first, end = datetime.date(2026, 1, 1), datetime.date(2026, 1, 2)
+    assert data[first] == ['Альфа + Бета']
+    for project in ('Альфа', 'бета'):
+        assert data.get_range(first, end, project=project) == [(first, ['Альфа + Бета'])]
+    merged = merge_calendars([data, data])
+    assert merged.get_range(first, end, project='Бета') == [(first, ['Альфа + Бета'])]
+
+
+def _month(title, days, *projects):
+    """Месяц листа: заголовок, строка дат и строки проектов"""
+    rows = [[title] + [''] * 7, [''] + [str(day) for day in days]]
+    rows += [list(project) for project in projects]
+    return rows
+
+
+def test_worksheets_without_year_continue_previous_sheet():
+    worksheets = _parse_calendar_worksheets('Осень, Весна, Лето 2030:2030, Зима')
+    assert worksheets == [('Осень', CALENDAR_START_YEAR), ('Весна', None),
+                          ('Лето 2030', 2030), ('Зима', None)]
+
+    autumn = _month('СЕНТЯБРЬ', range(1, 8)) + _month('ДЕКАБРЬ', range(1, 8))
+    spring = _month('ЯНВАРЬ', range(1, 8)) + _month('МАЙ', range(1, 8))
+    summer = _month('ИЮНЬ', range(1, 8))
+    winter = _month('ДЕКАБРЬ', range(1, 8)) + _month('ФЕВРАЛЬ', range(1, 8))
+    years = _start_years(worksheets, [autumn, spring, summer, winter])
+    assert years == [CALENDAR_START_YEAR, CALENDAR_START_YEAR + 1, 2030, 2030]
+
+
+def test_merged_worksheets_match_single_sheet():
+    autumn = _month('ДЕКАБРЬ', range(1, 8),
+                    ['Альфа', 'сбор', '', '', '', '', '', 'выезд'],
+                    ['Бета', 'концерт', '', '', '', '', '', ''])
+    spring = _month('ЯНВАРЬ', range(1, 8),
+                    ['Бета', 'Альфа + Бета', '', '', '', '', '', ''],
+                    ['Альфа', 'Альфа + Бета', 'сбор', '', '', '', '', ''])
+    jobs = list(zip([autumn, spring], _start_years([('Осень', 2025), ('Весна', None)], [autumn, spring])))
+    assert [start_year for _, start_year in jobs] == [2025, 2026]
+
+    expected = parse_calendar_data(autumn + spring, start_year=2025)
+    parts = _parse_worksheets(jobs)
+    for order in (parts, parts[::-1]):
+        merged = merge_calendars(order)
+        assert list(merged.items()) == list(expected.items())
+        assert merged.projects == expected.projects
+        assert merged.dates == expected.dates
+    assert merged[datetime.date(2025, 12, 1)] == ['Альфа: сбор', 'Бета: концерт']
+    assert merged.get_range(datetime.date(2026, 1, 1), datetime.date(2026, 2, 1), project='альфа') == [
+        (datetime.date(2026, 1, 1), ['Альфа + Бета']),
+        (datetime.date(2026, 1, 2), ['Альфа: сбор']),
+    ]
+
+
+def test_get_range_returns_copies():
+    data = parse_calendar_data(make_calendar(months=2, projects=10, seed=1), start_year=2026)
+    start, end = datetime.date(2026, 1, 1), datetime.date(2026, 3, 1)
+    before = {date: list(events) for date, events in data.items()}
+    project = next(iter(data.projects))
+    for result in (data.get_range(start, end), data.get_range(start, end, project=project)):
+        assert result
+        for _, events in result:
+            events.append('лишнее событие')
+            events.clear()
+    assert dict(data) == before
+    assert data.get_range(start, end) == [(date, before[date]) for date in data.dates
+                                          if start <= date < end]
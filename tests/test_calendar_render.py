@@ -0,0 +1,102 @@
+"""
+LRU готовых текстов календаря: предел размера, смена данных и смена дня
+"""
+import datetime
+import sys
+import types
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+import calendar_events.calendar as calendar_module
+from calendar_events.calendar import CalendarData
+
+LOADED_AT = datetime.datetime(2026, 1, 5, 8, 0)
+
+
+class FakeDate(datetime.date):
+    current = datetime.date(2026, 1, 5)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Список (дата начала, дней) каждой настоящей отрисовки"""
+    monkeypatch.setattr(calendar_module, 'datetime', types.SimpleNamespace(
+        date=FakeDate, datetime=datetime.datetime, timedelta=datetime.timedelta
+    ))
+    monkeypatch.setattr(FakeDate, 'current', datetime.date(2026, 1, 5))
+    monkeypatch.setattr(calendar_module, 'CALENDAR_RENDER_CACHE_SIZE', 3)
+    monkeypatch.setattr(calendar_module, '_RENDERED', OrderedDict())
+    monkeypatch.setattr(calendar_module, '_RENDERED_TIMESTAMP', None)
+
+    calls = []
+    format_output = calendar_module.format_calendar_output
+
+    def counting_format(events_by_date, target_date=None, days_ahead=7, timestamp=None):
+        calls.append((target_date, days_ahead))
+        return format_output(events_by_date, target_date, days_ahead, timestamp)
+
+    monkeypatch.setattr(calendar_module, 'format_calendar_output', counting_format)
+    return calls
+
+
+def _events():
+    return CalendarData({datetime.date(2026, 1, 5): ['Альфа: сбор']}).finalize()
+
+
+def test_hit_returns_same_text(renders):
+    events = _events()
+    first = calendar_module._render(events, 7, LOADED_AT)
+    assert calendar_module._render(events, 7, LOADED_AT) is first
+    assert len(renders) == 1
+    assert '- Альфа: сбор' in first
+
+
+def test_evicts_least_recently_used(renders):
+    events = _events()
+    for days in (1, 2, 3):
+        calendar_module._render(events, days, LOADED_AT)
+    # Обращение к 1 делает его свежим: вытесняется 2
+    calendar_module._render(events, 1, LOADED_AT)
+    calendar_module._render(events, 4, LOADED_AT)
+    assert len(calendar_module._RENDERED) == 3
+    assert [days for _, days in renders] == [1, 2, 3, 4]
+
+    calendar_module._render(events, 1, LOADED_AT)
+    calendar_module._render(events, 2, LOADED_AT)
+    assert [days for _, days in renders] == [1, 2, 3, 4, 2]
+    assert len(calendar_module._RENDERED) == 3
+
+
+def test_new_data_drops_old_texts(renders):
+    events = _events()
+    calendar_module._render(events, 7, LOADED_AT)
+    calendar_module._render(events, 3, LOADED_AT)
+    reloaded_at = LOADED_AT + datetime.timedelta(hours=1)
+    text = calendar_module._render(events, 7, reloaded_at)
+
+    assert len(renders) == 3
+    assert list(calendar_module._RENDERED) == [(FakeDate.current, 7, reloaded_at)]
+    assert f"Календарь обновлен: {reloaded_at.strftime('%Y-%m-%d %H:%M:%S')}" in text
+
+
+def test_next_day_renders_new_window(renders, monkeypatch):
+    events = _events()
+    today_text = calendar_module._render(events, 1, LOADED_AT)
+    monkeypatch.setattr(FakeDate, 'current', datetime.date(2026, 1, 6))
+    tomorrow_text = calendar_module._render(events, 1, LOADED_AT)
+
+    assert renders == [(datetime.date(2026, 1, 5), 1), (datetime.date(2026, 1, 6), 1)]
+    assert '- Альфа: сбор' in today_text
+    assert 'Вторник, 6 января (сегодня)' in tomorrow_text
+    assert '- Событий нет' in tomorrow_text
@@ -0,0 +1,139 @@
+"""
+Демон: протокол запросов, сокет только для владельца и запросы через rim_client
+"""
+import asyncio
+import json
+import os
+import socket
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+import rim_client
+from service import QueryService
+from service.daemon import _dispatch, _remove_stale_socket, serve
+
+TIMEOUT = 5
+
+
+class Backend:
+    """Календарь и сетка без Google Sheets"""
+
+    def __init__(self):
+        self.loaded = []
+
+    def calendar(self, days_ahead):
+        return f"календарь на {days_ahead}"
+
+    def calendar_load(self):
+        self.loaded.append('calendar')
+
+    def get(self, search_query, fuzzy=False):
+        return f"расписание {search_query} fuzzy={fuzzy}"
+
+    def load(self):
+        self.loaded.append('grid')
+        return True
+
+    def get_changes(self, since_version=None):
+        return {'from_version': since_version, 'to_version': 2, 'changes': []}
+
+    def get_refresh_status(self):
+        return {'version': 2}
+
+
+@pytest.fixture
+def service():
+    backend = Backend()
+    service = QueryService(scheduler=backend, calendar_get=backend.calendar,
+                           calendar_load=backend.calendar_load, max_workers=2)
+    yield service
+    service.close()
+
+
+def test_dispatch(service):
+    async def run():
+        return [await _dispatch(service, request) for request in (
+            {'text': '/calendar 3'},
+            {'text': 'Будай'},
+            {'command': 'calendar', 'days': 100},
+            {'command': 'grid', 'query': 'Будай', 'fuzzy': False},
+            {'command': 'changes', 'since': '1'},
+            {'command': 'metrics', 'format': 'json'},
+            {'command': 'нет такой'},
+        )]
+
+    text_calendar, text_grid, calendar, grid, changes, metrics, unknown = asyncio.run(run())
+    assert text_calendar == {'ok': True, 'reply': "календарь на 3"}
+    assert text_grid == {'ok': True, 'reply': "расписание Будай fuzzy=True"}
+    assert calendar == {'ok': True, 'reply': "календарь на 31"}
+    assert grid == {'ok': True, 'reply': "расписание Будай fuzzy=False"}
+    assert changes == {'ok': True, 'changes': {'from_version': 1, 'to_version': 2, 'changes': []}}
+    assert metrics['ok'] and 'counters' in metrics['metrics']
+    assert unknown['ok'] is False
+
+
+def test_warm_up_loads_both_sources(service):
+    asyncio.run(service.warm_up())
+    assert service.scheduler.loaded == ['calendar', 'grid']
+
+
+def test_stale_socket_removed_live_socket_kept(tmp_path):
+    path = str(tmp_path / 'rim.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    _remove_stale_socket(path)
+    assert not os.path.exists(path)
+
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        live.bind(path)
+        live.listen()
+        with pytest.raises(RuntimeError):
+            _remove_stale_socket(path)
+        assert os.path.exists(path)
+    finally:
+        live.close()
+
+
+def test_client_round_trip(service, tmp_path):
+    path = str(tmp_path / 'rim.sock')
+
+    async def run():
+        stop = asyncio.Event()
+        serving = asyncio.create_task(serve(service, path, stop))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+
+        loop = asyncio.get_running_loop()
+        replies = [
+            await loop.run_in_executor(None, rim_client.request, payload, path, TIMEOUT)
+            for payload in ({'text': 'Будай'}, {'command': 'status'})
+        ]
+        # Некорректная строка получает ошибку, а не обрывает соединение
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'not json\n' + json.dumps({'text': '/calendar 2'}).encode() + b'\n')
+        await writer.drain()
+        errors = [json.loads(await reader.readline()) for _ in range(2)]
+        writer.close()
+
+        stop.set()
+        await asyncio.wait_for(serving, TIMEOUT)
+        return mode, replies, errors
+
+    mode, (grid, status), (bad, calendar) = asyncio.run(run())
+    assert mode == 0o600
+    assert grid == {'ok': True, 'reply': "расписание Будай fuzzy=True"}
+    assert status['ok'] and status['status']['grid'] == {'version': 2}
+    assert bad['ok'] is False
+    assert calendar == {'ok': True, 'reply': "календарь на 2"}
+    assert not os.path.exists(path)
@@ -0,0 +1,127 @@
+"""
+Локальная копия таблицы: чтение CSV и XLSX, перечитывание по изменению файлов, выбор источника
+"""
+import contextlib
+import datetime
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from gspread.utils import absolute_range_name
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from common import datasource
+from common.datasource import LocalDataSource, local_signature, open_source
+
+
+def _write(path, text, mtime_ns=None):
+    path.write_text(text, encoding='utf-8-sig')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    _write(tmp_path / 'Сетка Четверг.csv', 'Организатор,9:00,10:00\nБудай Милана,сбор\n\n,\n')
+    _write(tmp_path / "Лист 'с кавычкой'.csv", 'a,b\n')
+    (tmp_path / 'заметки.txt').write_text('не лист', encoding='utf-8')
+    return tmp_path
+
+
+def test_csv_folder(csv_dir):
+    source = LocalDataSource(str(csv_dir))
+    assert [worksheet.title for worksheet in source.worksheets()] == ["Лист 'с кавычкой'", 'Сетка Четверг']
+    # Пустые строки в конце отброшены, строки дополнены до одной длины
+    assert source.worksheet('Сетка Четверг').get_all_values() == [
+        ['Организатор', '9:00', '10:00'],
+        ['Будай Милана', 'сбор', ''],
+    ]
+    titles = ["Лист 'с кавычкой'", 'Сетка Четверг']
+    response = source.values_batch_get([absolute_range_name(title) for title in titles])
+    assert [value_range['values'][0] for value_range in response['valueRanges']] == [
+        ['a', 'b'], ['Организатор', '9:00', '10:00']
+    ]
+    with pytest.raises(KeyError):
+        source.worksheet('Сетка Пятница')
+
+
+def test_xlsx_workbook(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = tmp_path / 'сетка.xlsx'
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Сетка Пятница'
+    sheet.append(['Организатор', 'Телефон', datetime.time(9, 30), 'Дата'])
+    sheet.append(['Будай Милана', 89152194413.0, True, datetime.datetime(2025, 7, 4)])
+    sheet.append([None, None, None, None])
+    workbook.create_sheet('Пустой')
+    workbook.save(path)
+
+    source = LocalDataSource(str(path))
+    assert [worksheet.title for worksheet in source.worksheets()] == ['Сетка Пятница', 'Пустой']
+    assert source.worksheet('Сетка Пятница').get_all_values() == [
+        ['Организатор', 'Телефон', '9:30', 'Дата'],
+        ['Будай Милана', '89152194413', 'TRUE', '04.07.2025'],
+    ]
+    # Как gspread: fill_gaps для пустого листа дает одну пустую строку
+    assert source.worksheet('Пустой').get_all_values() == [[]]
+
+
+def test_changed_file_is_reread(csv_dir, monkeypatch):
+    reads = []
+    read_csv = datasource._read_csv
+    monkeypatch.setattr(datasource, '_read_csv', lambda path: reads.append(path) or read_csv(path))
+    path = csv_dir / 'Сетка Четверг.csv'
+    _write(path, 'Организатор\nБудай\n', mtime_ns=1_000_000_000)
+    source = LocalDataSource(str(csv_dir))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert source.read('Сетка Четверг') == [['Организатор'], ['Будай']]
+        signature = source.signature()
+        assert source.read('Сетка Четверг') == [['Организатор'], ['Будай']]
+        assert len(reads) == 1
+
+        # Тот же размер, другое время модификации
+        _write(path, 'Организатор\nСёмин\n', mtime_ns=2_000_000_000)
+        assert source.signature() != signature
+        assert source.read('Сетка Четверг') == [['Организатор'], ['Сёмин']]
+        assert len(reads) == 2
+
+        # То же время модификации, другой размер
+        signature = source.signature()
+        _write(path, 'Организатор\nНовиков\n', mtime_ns=2_000_000_000)
+        assert source.signature() != signature
+        assert source.read('Сетка Четверг') == [['Организатор'], ['Новиков']]
+        assert len(reads) == 3
+
+
+def test_open_source_prefers_local_copy(csv_dir, monkeypatch):
+    opened = []
+    monkeypatch.setattr(datasource.sheets, 'open_spreadsheet',
+                        lambda url, credentials_path=None: opened.append((url, credentials_path)) or 'таблица')
+    monkeypatch.setattr(datasource, '_local_sources', {})
+
+    local = open_source('https://sheets.example/grid', 'creds.json', str(csv_dir))
+    assert isinstance(local, LocalDataSource)
+    assert open_source(None, local_path=str(csv_dir)) is local
+    assert opened == []
+
+    assert open_source('https://sheets.example/grid', 'creds.json') == 'таблица'
+    assert opened == [('https://sheets.example/grid', 'creds.json')]
+
+    with pytest.raises(FileNotFoundError):
+        open_source(None, local_path=str(csv_dir / 'нет'))
+    with pytest.raises(ValueError):
+        open_source(None)
+
+    assert local_signature(None) is None
+    assert local_signature(str(csv_dir / 'нет')) is None
+    assert [entry[0] for entry in local_signature(str(csv_dir))] == [
+        str(csv_dir / "Лист 'с кавычкой'.csv"), str(csv_dir / 'Сетка Четверг.csv')
+    ]
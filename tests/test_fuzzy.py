@@ -0,0 +1,29 @@
+"""
+Нечеткий поиск ФИО: транслитерация латиницы
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from grid.fuzzy import transliterate
+
+
+@pytest.mark.parametrize('latin, cyrillic', [
+    ('familiya', 'фамилия'),
+    ('mariya', 'мария'),
+    ('valeriya', 'валерия'),
+    ('yuliya', 'юлия'),
+    ('mariyu', 'марию'),
+    ('dmitriy', 'дмитрий'),
+    ('zhukov', 'жуков'),
+    ('shchukin', 'щукин'),
+    ('семин', 'семин'),
+])
+def test_transliterate(latin, cyrillic):
+    assert transliterate(latin) == cyrillic
@@ -0,0 +1,63 @@
+"""
+Параллельная загрузка дневных листов: один общий срок на все листы
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from grid.snapshot import fetch_day_values_concurrently
+
+TIMEOUT = 0.2
+
+
+class Worksheet:
+    def __init__(self, values=None, release=None, error=None):
+        self.values = values
+        self.release = release
+        self.error = error
+
+    def get_all_values(self):
+        if self.release is not None:
+            assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.values
+
+
+def test_failed_sheets_are_left_out():
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        day_values = fetch_day_values_concurrently({
+            'четверг': Worksheet([['Организатор']]),
+            'пятница': Worksheet(error=KeyError('лист удален')),
+        }, executor, TIMEOUT)
+    finally:
+        executor.shutdown()
+    assert day_values == {'четверг': [['Организатор']]}
+
+
+def test_slow_sheets_share_one_deadline():
+    release = threading.Event()
+    # Один поток: три медленных листа по очереди ждали бы 3 x TIMEOUT
+    executor = ThreadPoolExecutor(max_workers=1)
+    worksheets = {day: Worksheet([[day]], release) for day in ('четверг', 'пятница', 'суббота')}
+    started = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError) as error:
+            fetch_day_values_concurrently(worksheets, executor, TIMEOUT)
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert elapsed < 2 * TIMEOUT
+    assert 'суббота' in str(error.value)
@@ -0,0 +1,166 @@
+"""
+Инкрементальное обновление снимка сетки дает тот же результат, что и полная сборка;
+лента изменений между снимками
+"""
+import contextlib
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import ACTIVITIES, make_grid, FakeSpreadsheet
+from common import store
+from config import GRID_HISTORY_SIZE
+from grid.grid import GridScheduler
+
+QUERIES = ['Фамилия1', 'фамилия1 анна', 'Фамилия12', 'Семин', 'Сёмин', 'Новиков', 'ПЕТР', 'мил']
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'SNAPSHOT_DIR', str(tmp_path))
+
+
+def _scheduler(sheets):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        scheduler.days = scheduler._get_days_from_sheets()
+        assert scheduler.refresh()
+    return scheduler
+
+
+def _edit(rnd, sheets):
+    """Случайная правка одного листа"""
+    rows = sheets[rnd.choice(list(sheets))]
+    row = rnd.randrange(1, len(rows))
+    kind = rnd.randrange(6)
+    if kind == 0:
+        rows[row][rnd.randrange(3, len(rows[row]))] = rnd.choice(ACTIVITIES)
+    elif kind == 1:
+        # Только регистр или ё/е: нормализованное ФИО не меняется
+        name = rows[row][0]
+        rows[row][0] = name.upper() if rnd.random() < 0.5 else name.replace('е', 'ё')
+    elif kind == 2:
+        rows[row][0] = rnd.choice(['Семин Пётр', 'Сёмин Петр', 'Новиков Новик', rows[1][0]])
+    elif kind == 3 and len(rows) > 2:
+        del rows[row]
+    elif kind == 4:
+        rows.append([rnd.choice(['Новиков Новик', 'Семин Пётр'])] + rows[row][1:])
+    else:
+        rows[row][1] = f"8999{rnd.randint(1000000, 9999999)}"
+
+
+def _state(scheduler):
+    snapshot = scheduler._last_snapshot
+    return {
+        'positions': snapshot.index.positions,
+        'substrings': snapshot.index.substrings,
+        'display': snapshot.index.display,
+        'rendered': {name: reply for (name, _), reply in scheduler._rendered.items()},
+    }
+
+
+def test_incremental_matches_full_rebuild():
+    rnd = random.Random(7)
+    sheets = make_grid(organisers=40, slots=8, days=4)
+    incremental = _scheduler(sheets)
+
+    for step in range(30):
+        for _ in range(rnd.randint(1, 3)):
+            _edit(rnd, sheets)
+        with contextlib.redirect_stdout(io.StringIO()):
+            incremental.spreadsheet = FakeSpreadsheet(sheets)
+            assert incremental.refresh()
+        full = _scheduler(sheets)
+
+        assert _state(incremental) == _state(full), f"шаг {step}"
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert incremental.search_people(QUERIES, fuzzy=True) == full.search_people(QUERIES, fuzzy=True)
+
+
+def test_unchanged_refresh_keeps_replies():
+    sheets = make_grid(organisers=20, slots=6, days=3)
+    scheduler = _scheduler(sheets)
+    before = {query: scheduler.get(query) for query in QUERIES}
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert scheduler.refresh()
+    assert not scheduler._last_snapshot.changed_days
+    assert {query: scheduler.get(query) for query in QUERIES} == before
+
+
+def test_incremental_build_keeps_previous_activity_table():
+    sheets = make_grid(organisers=10, slots=6, days=3)
+    scheduler = _scheduler(sheets)
+    old = scheduler._last_snapshot
+    old_names = list(old.activities.names)
+
+    first_day = next(iter(sheets))
+    sheets[first_day][1][3] = 'новая активность'
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        assert scheduler.refresh()
+    new = scheduler._last_snapshot
+
+    assert new.changed_days == {scheduler.days[0]}
+    assert old.activities.names == old_names
+    assert new.activities is not old.activities
+    assert new.activities.names[:len(old_names)] == old_names
+    assert 'новая активность' in new.activities.names
+
+
+def _refresh(scheduler, sheets):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        assert scheduler.refresh()
+
+
+def test_change_feed():
+    sheets = make_grid(organisers=6, slots=4, days=2)
+    scheduler = _scheduler(sheets)
+    assert scheduler.get_changes() == {'from_version': 1, 'to_version': 1, 'changes': []}
+
+    rows = sheets['Сетка Понедельник']
+    first = scheduler._last_snapshot
+    old_first = scheduler._extract_schedule(
+        first.person_row('фамилия0 анна', 'понедельник'), first.sheets['понедельник']
+    )
+    rows[1][3] = 'новая активность'
+    rows.append(['Новиков Новик'] + rows[2][1:])
+    removed = rows.pop(3)
+    _refresh(scheduler, sheets)
+
+    feed = scheduler.get_changes()
+    assert (feed['from_version'], feed['to_version']) == (1, 2)
+    assert [(change['name'], change['day']) for change in feed['changes']] == [
+        ('Фамилия0 Анна', 'понедельник'),
+        ('Новиков Новик', 'понедельник'),
+        (removed[0], 'понедельник'),
+    ]
+    edited, added, gone = feed['changes']
+    assert edited['old'] == old_first
+    assert edited['new'][0] == {'start': '9:00', 'end': '9:30', 'activity': 'новая активность'}
+    assert added['old'] is None and added['new'][0]['activity'] == rows[2][3]
+    assert gone['new'] is None and gone['old'][0]['activity'] == removed[3]
+    assert scheduler.get_changes(since_version=2)['changes'] == []
+
+
+def test_change_feed_history_limit():
+    sheets = make_grid(organisers=6, slots=4, days=2)
+    scheduler = _scheduler(sheets)
+    for version in range(2, GRID_HISTORY_SIZE + 2):
+        sheets['Сетка Вторник'][1][3] = f"активность {version}"
+        _refresh(scheduler, sheets)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert scheduler.get_changes(since_version=1) is None
+    oldest = scheduler.get_changes(since_version=2)
+    assert (oldest['from_version'], oldest['to_version']) == (2, GRID_HISTORY_SIZE + 1)
+    assert [change['name'] for change in oldest['changes']] == ['Фамилия0 Анна']
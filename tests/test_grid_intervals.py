@@ -0,0 +1,90 @@
+"""
+Запросы «кто где»: слоты после полуночи, интервалы и свободные организаторы
+"""
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import FakeSpreadsheet
+from common import store
+from grid.grid import GridScheduler
+from grid.intervals import MINUTES_PER_DAY
+
+DAY = 'пятница'
+SHEETS = {
+    'Сетка Пятница': [
+        ['Организатор', 'Телефон', 'Должность', '21:00', '22:00', '23:00', '0:00', '1:00'],
+        ['Иванов Иван', '89150000001', 'орг', 'ужин', 'ужин', 'сбор', 'свободен', 'отбой'],
+        ['Петров Петр', '89150000002', 'орг', '', 'дежурство', '', '', ''],
+        ['Сидорова Анна', '89150000003', 'координатор', 'Свободна', '', '', '', ''],
+    ],
+}
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'SNAPSHOT_DIR', str(tmp_path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(SHEETS)
+        scheduler.days = scheduler._get_days_from_sheets()
+        assert scheduler.refresh()
+    return scheduler
+
+
+def test_slot_index_unwraps_night_slots(scheduler):
+    slots = scheduler._last_snapshot.slots[DAY]
+    assert slots.minutes == [21 * 60, 22 * 60, 23 * 60, MINUTES_PER_DAY, MINUTES_PER_DAY + 60]
+    assert slots.slot_at(21 * 60 + 59) == 0
+    assert slots.slot_at(30) == 3
+    assert slots.slot_at(30, unwrap=False) is None
+    assert slots.slot_at(MINUTES_PER_DAY + 2 * 60) is None
+    assert slots.slot_at(12 * 60) is None
+
+
+def test_who_is_at(scheduler):
+    assert scheduler.who_is_at('21:00', day=DAY) == {
+        'ужин': ['Иванов Иван'],
+        'Свободна': ['Сидорова Анна'],
+    }
+    # Пустые ячейки продолжают предыдущую активность
+    assert scheduler.who_is_at('0:30', day=DAY) == {
+        'свободен': ['Иванов Иван'],
+        'дежурство': ['Петров Петр'],
+        'Свободна': ['Сидорова Анна'],
+    }
+    assert scheduler.who_is_at('1:15', day=DAY, activity='ОТБ') == {'отбой': ['Иванов Иван']}
+    assert scheduler.who_is_at('12:00', day=DAY) == {}
+    assert scheduler.who_is_at('не время', day=DAY) == {}
+    assert scheduler.who_is_at('21:00', day='понедельник') == {}
+
+
+def test_who_is_between_wraps_past_midnight(scheduler):
+    assert scheduler.who_is_between('23:30', '0:30', day=DAY) == {
+        'сбор': ['Иванов Иван'],
+        'свободен': ['Иванов Иван'],
+        'дежурство': ['Петров Петр'],
+        'Свободна': ['Сидорова Анна'],
+    }
+    assert scheduler.who_is_between('21:00', '2:00', day=DAY, activity='дежур') == {
+        'дежурство': ['Петров Петр'],
+    }
+    assert scheduler.who_is_between('1:00', '1:30', day=DAY) == {
+        'отбой': ['Иванов Иван'],
+        'дежурство': ['Петров Петр'],
+        'Свободна': ['Сидорова Анна'],
+    }
+
+
+def test_who_is_free(scheduler):
+    assert scheduler.who_is_free('21:30', day=DAY) == ['Петров Петр', 'Сидорова Анна']
+    assert scheduler.who_is_free('0:00', day=DAY) == ['Иванов Иван', 'Сидорова Анна']
+    assert scheduler.who_is_free('12:00', day=DAY) == []
@@ -0,0 +1,262 @@
+"""
+Поиск по сетке: статусы пакетного поиска и ответы, совпадающие с прежним перебором листов
+"""
+import contextlib
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+from gspread.utils import fill_gaps, numericise_all
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmarks.fixtures import FIRST_NAMES, FakeSpreadsheet, make_grid
+from common import store
+from grid.grid import GridScheduler
+from grid.index import normalize_name
+
+# Прежний вывод знал только листы с четверга по воскресенье
+SHEETS = dict(list(make_grid(organisers=40, slots=8, days=7).items())[3:])
+QUERIES = [
+    'Фамилия12', 'Фамилия1', 'фамилия1 милана', 'ФАМИЛИЯ3 иван', 'анна', 'мил', 'Фамилия 9',
+    'Фамилия18 Пётр', 'иван фамилия2', 'Нетакого', 'Фамилия12 Анна',
+]
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'SNAPSHOT_DIR', str(tmp_path))
+
+
+def _scheduler(sheets=SHEETS):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        scheduler.days = scheduler._get_days_from_sheets()
+        assert scheduler.refresh()
+    return scheduler
+
+
+def _baseline_person(sheets, days, search_query, exact=False):
+    """
+    Прежний поиск: get_all_records каждого листа и перебор строк при каждом запросе
+
+    exact=True ищет строку с ФИО, равным запросу, - так отрисовывается готовый ответ.
+    """
+    search_words = search_query.lower().strip().split()
+
+    def matches(name):
+        name = str(name).lower().strip()
+        if exact:
+            return name == search_query.lower().strip()
+        return all(word in name for word in search_words)
+
+    person_data = {'name': '', 'phone': '', 'position': '', 'schedule': {}}
+    found = False
+    for day in days:
+        title = next(title for title in sheets if day in title.lower())
+        values = fill_gaps([list(row) for row in sheets[title]])
+        headers = values[0]
+        records = [
+            dict(zip(headers, numericise_all(row, empty2zero=False, default_blank='')))
+            for row in values[1:]
+        ]
+        person_row = next((
+            record for record in records
+            if matches(record['Организатор'])
+        ), None)
+        if person_row is None:
+            continue
+        found = True
+        if not person_data['name']:
+            person_data['name'] = person_row['Организатор']
+            person_data['phone'] = str(person_row.get('Телефон', ''))
+            person_data['position'] = person_row.get('Должность', '')
+
+        activities = [
+            (column, str(person_row[column]).strip())
+            for column in headers
+            if ':' in str(column) and str(person_row[column]).strip()
+        ]
+        schedule = []
+        for idx, (start, activity) in enumerate(activities):
+            if idx and activity == activities[idx - 1][1]:
+                continue
+            schedule.append({'start': start, 'end': 'До конца', 'activity': activity})
+            if len(schedule) > 1:
+                schedule[-2]['end'] = start
+        person_data['schedule'][day] = schedule
+    return person_data if found else None
+
+
+def _baseline_get(sheets, days, search_query):
+    """Прежний текст ответа GridScheduler.get()"""
+    if not search_query:
+        return "Ошибка: Введите фамилию или фамилию+имя для поиска"
+    person_data = _baseline_person(sheets, days, search_query.strip())
+    if not person_data:
+        return f"Сотрудник '{search_query}' не найден"
+    return _baseline_format(days, person_data)
+
+
+def _baseline_format(days, person_data):
+    """Прежний format_schedule_for_bot"""
+    result = f"👤 {person_data['name']}\n📞 {person_data['phone']}\n📋 {person_data['position']}\n\n"
+    for day in days:
+        if day not in person_data['schedule']:
+            continue
+        result += f"📅 {day.capitalize()}:\n"
+        for item in person_data['schedule'][day]:
+            result += f"    {item['start']} - {item['end']}: {item['activity']}\n"
+        result += "\n"
+    return result.strip()
+
+
+def test_get_matches_baseline_text():
+    scheduler = _scheduler()
+    assert scheduler.days == ['четверг', 'пятница', 'суббота', 'воскресенье']
+    for query in QUERIES + ['']:
+        expected = _baseline_get(SHEETS, scheduler.days, query)
+        assert scheduler.get(query) == expected, query
+        assert scheduler.get_many([query])[query] == expected, query
+
+
+def test_search_people_statuses():
+    scheduler = _scheduler()
+    queries = ['Фамилия12', 'Фамилия1', 'Фамелия12 Мария', 'ivanov', 'Нетакого', '', 'Фамилия12']
+    with contextlib.redirect_stdout(io.StringIO()):
+        answers = scheduler.search_people(queries, fuzzy=True)
+
+    assert list(answers) == queries[:-1]
+    assert {query: answer['query'] for query, answer in answers.items()} == {query: query for query in answers}
+
+    found = answers['Фамилия12']
+    assert found['status'] == 'found'
+    assert found['matches'] == ['Фамилия12 Мария']
+    assert found['reply'] == scheduler.get('Фамилия12 Мария')
+
+    ambiguous = answers['Фамилия1']
+    assert ambiguous['status'] == 'ambiguous'
+    assert ambiguous['matches'] == sorted(
+        f"Фамилия{i} {FIRST_NAMES[i % len(FIRST_NAMES)]}" for i in [1, *range(10, 20)]
+    )
+    # Ответ - расписание первого подходящего организатора
+    assert ambiguous['reply'] == scheduler.get('Фамилия1 Милана')
+
+    fuzzy = answers['Фамелия12 Мария']
+    assert fuzzy['status'] == 'fuzzy'
+    assert fuzzy['matches'][0] == 'Фамилия12 Мария'
+    assert fuzzy['reply'] == found['reply']
+
+    # Нет явного лидера: только список вариантов
+    suggested = answers['ivanov']
+    assert suggested['status'] == 'not_found'
+    assert suggested['matches'] and all(name.endswith('Иван') for name in suggested['matches'])
+    assert suggested['reply'] == (
+        f"Сотрудник 'ivanov' не найден. Возможно, вы искали: {', '.join(suggested['matches'])}"
+    )
+
+    assert answers['Нетакого'] == {
+        'query': 'Нетакого', 'status': 'not_found', 'matches': [],
+        'reply': "Сотрудник 'Нетакого' не найден",
+    }
+    assert answers['']['status'] == 'not_found'
+    assert answers['']['reply'] == "Ошибка: Введите фамилию или фамилию+имя для поиска"
+
+    # Без fuzzy похожие ФИО не ищутся
+    assert scheduler.search_people(['Фамелия12 Мария'])['Фамелия12 Мария']['status'] == 'not_found'
+    assert scheduler.get_many(queries) == {query: answer['reply'] for query, answer in
+                                           scheduler.search_people(queries).items()}
+
+
+def test_batched_load_matches_baseline():
+    spreadsheet = FakeSpreadsheet(SHEETS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = spreadsheet
+        scheduler.days = scheduler._get_days_from_sheets()
+        assert scheduler.refresh()
+    # Все дневные листы пришли одним запросом values:batchGet
+    assert spreadsheet.calls['values'] == 1
+
+    for query in QUERIES:
+        assert scheduler.search_person(query) == _baseline_person(SHEETS, scheduler.days, query), query
+
+
+def test_stale_reloads_make_no_metadata_calls():
+    spreadsheet = FakeSpreadsheet(SHEETS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = spreadsheet
+        assert scheduler.refresh()
+    meta = spreadsheet.calls['meta']
+
+    # Снимок устаревает сразу: каждый get() запускает фоновую загрузку
+    refresher = scheduler._refresher
+    refresher.min_interval = refresher.max_interval = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in QUERIES:
+            scheduler.get(query)
+            with refresher._lock:
+                assert refresher._done.wait_for(lambda: not refresher._refreshing, 5)
+
+    assert spreadsheet.calls['values'] == 1 + len(QUERIES)
+    assert spreadsheet.calls['meta'] == meta
+
+
+def test_name_index_matches_linear_scan():
+    scheduler = _scheduler()
+    snapshot = scheduler._last_snapshot
+    rnd = random.Random(3)
+    names = [row[0] for row in next(iter(SHEETS.values()))[1:]]
+    queries = ['', 'нетакого', 'фамилия', 'а', 'фамилия1 нетакого']
+    for _ in range(200):
+        words = rnd.choice(names).split()
+        picked = rnd.sample(words, rnd.randint(1, len(words)))
+        queries.append(' '.join(
+            word[start:rnd.randint(start + 1, len(word))]
+            for word in picked for start in [rnd.randrange(len(word))]
+        ))
+
+    for query in queries:
+        words = normalize_name(query).split()
+        expected = {}
+        for title, rows in SHEETS.items():
+            day = title.split()[-1].lower()
+            expected_row = next((
+                (row_idx, normalize_name(row[0])) for row_idx, row in enumerate(rows[1:])
+                if all(word in normalize_name(row[0]) for word in words)
+            ), None)
+            if expected_row is not None:
+                expected[day] = expected_row
+        assert snapshot.index.lookup(query) == expected, query
+
+
+def test_rendered_replies_match_baseline():
+    sheets = {title: [list(row) for row in rows] for title, rows in SHEETS.items()}
+    scheduler = _scheduler(sheets)
+
+    def check():
+        snapshot = scheduler._last_snapshot
+        names = {row[0] for rows in sheets.values() for row in rows[1:]}
+        expected = {
+            (normalize_name(name), snapshot.version):
+                _baseline_format(scheduler.days, _baseline_person(sheets, scheduler.days, name, exact=True))
+            for name in names
+        }
+        assert scheduler._rendered == expected
+
+    check()
+    # Готовые ответы неизмененных организаторов переносятся из прошлой версии
+    sheets['Сетка Пятница'][5][4] = 'новая активность'
+    sheets['Сетка Суббота'].append(['Новиков Новик', '89990000000', 'орг'] + ['сбор'] * 8)
+    del sheets['Сетка Воскресенье'][7]
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        assert scheduler.refresh()
+    check()
@@ -0,0 +1,109 @@
+"""
+Метрики: пустой путь при выключенном сборе, форматы выгрузки и показатели кешей
+"""
+import gc
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from common import metrics
+from common.refresher import AGE_GAUGE, BackgroundRefresher
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', False)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _gauge_labels(name):
+    return [entry['labels'] for entry in metrics.export_json()['gauges'] if entry['name'] == name]
+
+
+def test_disabled_metrics_record_nothing():
+    assert metrics.stage('grid.search') is metrics._NOOP
+    with metrics.stage('grid.search'):
+        pass
+    metrics.observe('rim_test_seconds', 0.1)
+    metrics.inc('rim_test_total')
+
+    exported = metrics.export_json()
+    assert exported['enabled'] is False
+    assert exported['histograms'] == []
+    assert exported['counters'] == []
+
+
+def test_trace_times_stages_while_disabled():
+    with metrics.trace() as spans:
+        with metrics.stage('grid.search'):
+            pass
+    assert [stage for stage, _ in spans] == ['grid.search']
+    assert metrics.export_json()['histograms'] == []
+
+
+def test_json_export():
+    metrics.enable()
+    metrics.observe('rim_test_seconds', 0.003, stage='parse')
+    metrics.observe('rim_test_seconds', 100, stage='parse')
+    metrics.inc('rim_test_total', 2, result='hit')
+
+    exported = json.loads(metrics.dump_json())
+    histogram, = exported['histograms']
+    assert histogram['name'] == 'rim_test_seconds'
+    assert histogram['labels'] == {'stage': 'parse'}
+    assert histogram['buckets']['0.005'] == 1
+    # Значения больше последней границы попадают только в count и sum
+    assert sum(histogram['buckets'].values()) == 1
+    assert histogram['count'] == 2
+    assert histogram['sum'] == pytest.approx(100.003)
+    assert exported['counters'] == [{'name': 'rim_test_total', 'labels': {'result': 'hit'}, 'value': 2}]
+
+
+def test_prometheus_export():
+    metrics.enable()
+    metrics.observe('rim_test_seconds', 0.003, stage='parse')
+    metrics.observe('rim_test_seconds', 0.3, stage='parse')
+    metrics.inc('rim_test_total', query='"Будай"\n')
+
+    lines = metrics.export_prometheus().splitlines()
+    assert lines.count('# TYPE rim_test_seconds histogram') == 1
+    assert 'rim_test_seconds_bucket{stage="parse",le="0.001"} 0' in lines
+    assert 'rim_test_seconds_bucket{stage="parse",le="0.005"} 1' in lines
+    assert 'rim_test_seconds_bucket{stage="parse",le="0.5"} 2' in lines
+    assert 'rim_test_seconds_bucket{stage="parse",le="+Inf"} 2' in lines
+    assert 'rim_test_seconds_count{stage="parse"} 2' in lines
+    assert 'rim_test_seconds_sum{stage="parse"} 0.303' in lines
+    assert '# TYPE rim_test_total counter' in lines
+    assert 'rim_test_total{query="\\"Будай\\"\\n"} 1' in lines
+
+
+def test_gauges_are_unique_and_released():
+    assert metrics.register_gauge('rim_test_gauge', lambda: 1.5, kind='first')
+    assert not metrics.register_gauge('rim_test_gauge', lambda: 2.5, kind='first')
+    assert 'rim_test_gauge{kind="first"} 1.5' in metrics.export_prometheus().splitlines()
+    metrics.unregister_gauge('rim_test_gauge', kind='first')
+    assert _gauge_labels('rim_test_gauge') == []
+
+    first = BackgroundRefresher(lambda: 'данные', min_interval=0, max_interval=60, name='метрики')
+    second = BackgroundRefresher(lambda: 'данные', min_interval=0, max_interval=60, name='метрики')
+    first.get()
+    second.get()
+    caches = {labels['cache'] for labels in _gauge_labels(AGE_GAUGE)}
+    assert {'метрики', 'метрики-2'} <= caches
+
+    # Показатель не держит кеш в памяти и исчезает вместе с ним
+    del first
+    gc.collect()
+    caches = {labels['cache'] for labels in _gauge_labels(AGE_GAUGE)}
+    assert 'метрики' not in caches and 'метрики-2' in caches
+    second.close()
+    assert 'метрики-2' not in {labels['cache'] for labels in _gauge_labels(AGE_GAUGE)}
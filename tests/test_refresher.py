@@ -0,0 +1,193 @@
+"""
+BackgroundRefresher: одна загрузка на всех, устаревшие данные во время обновления,
+ограничение попыток после ошибки и обновление по изменению источника
+"""
+import datetime
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from common import refresher as refresher_module
+from common.refresher import BackgroundRefresher
+
+TIMEOUT = 5
+
+
+class BlockingLoader:
+    """Загрузчик, который ждет release() и считает вызовы"""
+
+    def __init__(self, values=None):
+        self.calls = 0
+        self.started = threading.Event()
+        self._release = threading.Event()
+        self._values = iter(values or ['новое'])
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        assert self._release.wait(TIMEOUT)
+        return next(self._values)
+
+    def release(self):
+        self._release.set()
+
+
+def _wait_idle(refresher):
+    """Ожидание окончания фоновой загрузки"""
+    with refresher._lock:
+        assert refresher._done.wait_for(lambda: not refresher._refreshing, TIMEOUT)
+
+
+def test_concurrent_cold_gets_share_one_load():
+    loader = BlockingLoader()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=60, name='тест')
+    results = []
+
+    def get():
+        results.append(refresher.get()[0])
+
+    threads = [threading.Thread(target=get) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(TIMEOUT)
+    loader.release()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert loader.calls == 1
+    assert results == ['новое'] * 20
+
+
+def test_stale_value_served_while_refreshing():
+    loader = BlockingLoader()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=60, name='тест')
+    old_timestamp = datetime.datetime.now() - datetime.timedelta(seconds=120)
+    assert refresher.seed('старое', old_timestamp)
+
+    assert refresher.get() == ('старое', old_timestamp)
+    assert loader.started.wait(TIMEOUT)
+    # Пока фоновая загрузка идет, отдается старое значение и новая не запускается
+    for _ in range(5):
+        assert refresher.get()[0] == 'старое'
+    assert refresher.status()['refreshing']
+
+    loader.release()
+    _wait_idle(refresher)
+    assert refresher.get()[0] == 'новое'
+    assert loader.calls == 1
+
+
+def test_cold_failure_is_not_retried_within_min_interval():
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError('нет связи')
+
+    refresher = BackgroundRefresher(failing, min_interval=60, max_interval=60, name='тест')
+    with pytest.raises(RuntimeError) as first:
+        refresher.get()
+    for _ in range(3):
+        with pytest.raises(RuntimeError) as again:
+            refresher.get()
+        assert again.value is first.value
+    assert len(calls) == 1
+
+    refresher.min_interval = 0
+    with pytest.raises(RuntimeError):
+        refresher.get()
+    assert len(calls) == 2
+
+
+def test_changed_source_marks_value_stale(monkeypatch):
+    monkeypatch.setattr(refresher_module, 'CHANGE_CHECK_INTERVAL', 0)
+    changed = threading.Event()
+    loader = BlockingLoader(['первое', 'второе'])
+    loader.release()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=3600,
+                                    name='тест', changed=changed.is_set)
+
+    assert refresher.get()[0] == 'первое'
+    assert refresher.get()[0] == 'первое'
+    assert loader.calls == 1
+
+    changed.set()
+    # Изменение замечено: старое значение отдается, обновление идет в фоне
+    assert refresher.get()[0] == 'первое'
+    _wait_idle(refresher)
+    changed.clear()
+    assert refresher.get()[0] == 'второе'
+    assert loader.calls == 2
+
+
+def test_get_waits_for_async_seed():
+    loader = BlockingLoader()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=60, name='тест')
+    built = threading.Event()
+    timestamp = datetime.datetime.now() - datetime.timedelta(seconds=10)
+
+    def build():
+        assert built.wait(TIMEOUT)
+        return 'с диска', timestamp
+
+    assert refresher.seed_async(build)
+    assert not refresher.seed_async(build)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(refresher.get()))
+    thread.start()
+    built.set()
+    thread.join(TIMEOUT)
+
+    assert results == [('с диска', timestamp)]
+    assert loader.calls == 0
+
+
+def test_refresh_during_async_seed_runs_loader():
+    loader = BlockingLoader()
+    loader.release()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=60, name='тест')
+    built = threading.Event()
+    timestamp = datetime.datetime.now()
+
+    def build():
+        assert built.wait(TIMEOUT)
+        return 'с диска', timestamp
+
+    assert refresher.seed_async(build)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(refresher.refresh()[0]))
+    thread.start()
+    # refresh() ждет окончания подготовки, а не возвращает снимок с диска
+    deadline = time.monotonic() + TIMEOUT
+    while not refresher._done._waiters:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    built.set()
+    thread.join(TIMEOUT)
+
+    assert results == ['новое']
+    assert loader.calls == 1
+    assert refresher.get()[0] == 'новое'
+
+
+def test_failed_async_seed_falls_back_to_loader():
+    loader = BlockingLoader()
+    loader.release()
+    refresher = BackgroundRefresher(loader, min_interval=0, max_interval=60, name='тест')
+
+    def build():
+        raise ValueError('снимок поврежден')
+
+    assert refresher.seed_async(build)
+    assert refresher.get()[0] == 'новое'
+    assert loader.calls == 1
@@ -0,0 +1,71 @@
+"""
+QueryService: одинаковые одновременные запросы выполняются один раз
+"""
+import asyncio
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from service import FakeChatTransport, QueryService
+
+TIMEOUT = 5
+
+
+class BlockingBackend:
+    """Календарь и сетка, которые отвечают только после release"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def _call(self, key):
+        with self._lock:
+            self.calls[key] += 1
+        assert self.release.wait(TIMEOUT)
+
+    def calendar(self, days_ahead):
+        self._call(('calendar', days_ahead))
+        return f"календарь на {days_ahead}"
+
+    def get(self, search_query, fuzzy=False):
+        self._call(('grid', search_query))
+        return f"расписание {search_query}"
+
+
+def test_duplicate_messages_share_one_upstream_call():
+    backend = BlockingBackend()
+    service = QueryService(scheduler=backend, calendar_get=backend.calendar, max_workers=4)
+    transport = FakeChatTransport()
+    messages = [(chat_id, '/calendar 3') for chat_id in range(10)]
+    messages += [(chat_id, 'Будай') for chat_id in range(10, 20)]
+    for chat_id, text in messages:
+        transport.post(chat_id, text)
+    transport.close()
+
+    async def run():
+        serving = asyncio.create_task(service.serve(transport))
+        # Все сообщения уже в очереди: их задачи доходят до ожидания запроса
+        # за один проход цикла событий, пока первые запросы заблокированы
+        while len(backend.calls) < 2:
+            await asyncio.sleep(0.01)
+        backend.release.set()
+        await asyncio.wait_for(serving, TIMEOUT)
+
+    try:
+        asyncio.run(run())
+    finally:
+        service.close()
+
+    assert backend.calls == {('calendar', 3): 1, ('grid', 'Будай'): 1}
+    assert sorted(transport.sent) == sorted(
+        (chat_id, "календарь на 3" if text.startswith('/calendar') else "расписание Будай")
+        for chat_id, text in messages
+    )
+
@@ -0,0 +1,130 @@
+"""
+Клиент Google Sheets: корзина токенов и повтор запросов при 429 и ошибках сервера
+"""
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from gspread.exceptions import APIError
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from common import sheets
+from common.sheets import QuotaStats, RateLimitedHTTPClient, TokenBucket
+
+
+class FakeClock:
+    """Часы, которые идут только во время sleep()"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class FakeResponse:
+    def __init__(self, code):
+        self.status_code = code
+        self.ok = code < 400
+        self.text = ''
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': 'ошибка', 'status': ''}}
+
+
+class FakeSession:
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.calls = 0
+
+    def request(self, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.codes.pop(0))
+
+
+def _client(codes, clock, rate=100, capacity=10):
+    class Client(RateLimitedHTTPClient):
+        bucket = TokenBucket(rate, capacity, clock=clock, sleep=clock.sleep)
+        stats = QuotaStats()
+        sleep = staticmethod(clock.sleep)
+
+    return Client(auth=None, session=FakeSession(codes))
+
+
+def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+    assert bucket.available() == pytest.approx(0)
+
+    clock.now += 10
+    assert bucket.available() == 3
+
+
+def test_retries_rate_limited_request(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_BACKOFF_BASE_SECONDS', 1)
+    monkeypatch.setattr(sheets, 'SHEETS_BACKOFF_MAX_SECONDS', 1.5)
+    clock = FakeClock()
+    client = _client([429, 503, 429, 200], clock)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.request('get', 'https://sheets.example/values')
+
+    assert response.ok
+    assert client.session.calls == 4
+    assert len(clock.sleeps) == 3
+    # Пауза растет как base * 2^attempt, но не больше SHEETS_BACKOFF_MAX_SECONDS
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(1.5, 2 ** attempt)
+    assert client.stats.snapshot() == {
+        'requests': 4, 'throttled': 0, 'throttle_wait_seconds': 0.0,
+        'retries': 3, 'rate_limited': 2, 'errors': 0,
+    }
+
+
+def test_throttled_requests_are_counted():
+    clock = FakeClock()
+    client = _client([200, 200, 200], clock, rate=1, capacity=1)
+    for _ in range(3):
+        client.request('get', 'https://sheets.example/values')
+    stats = client.stats.snapshot()
+    assert stats['requests'] == 3
+    assert stats['throttled'] == 2
+    assert stats['throttle_wait_seconds'] == pytest.approx(2)
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_MAX_RETRIES', 2)
+    clock = FakeClock()
+    client = _client([429] * 5, clock)
+    with contextlib.redirect_stdout(io.StringIO()):
+        with pytest.raises(APIError):
+            client.request('get', 'https://sheets.example/values')
+    assert client.session.calls == 3
+    stats = client.stats.snapshot()
+    assert (stats['retries'], stats['rate_limited'], stats['errors']) == (2, 3, 1)
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    client = _client([403], clock)
+    with pytest.raises(APIError):
+        client.request('get', 'https://sheets.example/values')
+    assert client.session.calls == 1
+    assert clock.sleeps == []
+    assert client.stats.snapshot()['errors'] == 1
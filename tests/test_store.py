@@ -0,0 +1,189 @@
+"""
+Снимки на диске: сохранение и загрузка, проверка источника и формата,
+восстановление сетки и календаря при старте
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корень проекта в sys.path
+current_dir = Path(__file__).parent.parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+import calendar_events.calendar as calendar_module
+from benchmarks.fixtures import FakeSpreadsheet, make_grid
+from common import store
+from common.refresher import BackgroundRefresher
+from grid.grid import GridScheduler
+
+SOURCE = {'url': 'https://example.com/table', 'worksheets': [('Лист1', 2026)]}
+LOADED_AT = datetime.datetime(2026, 1, 5, 12, 30)
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _write(snapshot_dir, kind, document):
+    (snapshot_dir / f"{kind}.json").write_text(json.dumps(document, ensure_ascii=False), encoding='utf-8')
+
+
+def _load(kind, source=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return store.load(kind, source)
+
+
+def test_round_trip():
+    payload = {'days': {'четверг': [['Организатор', '9:00'], ['Фамилия0 Анна', 'сбор']]}}
+    store.save('grid', payload, LOADED_AT, SOURCE)
+    assert store.load('grid', SOURCE) == (payload, LOADED_AT)
+    assert store.load('calendar', SOURCE) is None
+
+
+def test_failed_save_leaves_no_files(snapshot_dir, monkeypatch):
+    store.save('grid', {'days': {}}, LOADED_AT, SOURCE)
+    before = sorted(os.listdir(snapshot_dir))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.save('grid', {'days': {'четверг': {1, 2}}}, LOADED_AT, SOURCE)
+
+        def fail_replace(src, dst):
+            raise OSError('диск переполнен')
+
+        monkeypatch.setattr(store.os, 'replace', fail_replace)
+        store.save('grid', {'days': {'четверг': []}}, LOADED_AT, SOURCE)
+
+    assert sorted(os.listdir(snapshot_dir)) == before == ['grid.json']
+    assert store.load('grid', SOURCE) == ({'days': {}}, LOADED_AT)
+
+
+def test_wrong_source_or_format_is_skipped(snapshot_dir):
+    store.save('grid', {'days': {}}, LOADED_AT, SOURCE)
+    assert _load('grid', {'url': 'https://example.com/other'}) is None
+    assert _load('grid') is None
+
+    document = json.loads((snapshot_dir / 'grid.json').read_text(encoding='utf-8'))
+    _write(snapshot_dir, 'grid', dict(document, format=store.FORMAT_VERSION - 1))
+    assert _load('grid', SOURCE) is None
+    _write(snapshot_dir, 'grid', dict(document, kind='calendar'))
+    assert _load('grid', SOURCE) is None
+
+
+@pytest.mark.parametrize('document', [
+    [],
+    'снимок',
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': None, 'payload': {}},
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': None, 'timestamp': 'x', 'payload': {}},
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': None, 'timestamp': 5, 'payload': {}},
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': None, 'timestamp': LOADED_AT.isoformat()},
+])
+def test_corrupt_document_is_skipped(snapshot_dir, document):
+    _write(snapshot_dir, 'grid', document)
+    assert _load('grid') is None
+
+
+def test_broken_json_is_skipped(snapshot_dir):
+    (snapshot_dir / 'grid.json').write_text('{"format": 2, "kind"', encoding='utf-8')
+    assert _load('grid') is None
+
+
+def _scheduler(sheets):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(sheets)
+        assert scheduler.refresh()
+    return scheduler
+
+
+def test_grid_restores_saved_snapshot():
+    sheets = make_grid(organisers=10, slots=4, days=2)
+    reply = _scheduler(sheets).get('Фамилия3')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        restored = GridScheduler()
+        # Ответ из снимка с диска, без обращения к таблице
+        assert restored.spreadsheet is None
+        assert restored.get('Фамилия3') == reply
+        assert restored.days == ['понедельник', 'вторник']
+
+
+def test_refresh_replaces_stale_restored_snapshot():
+    sheets = make_grid(organisers=10, slots=4, days=2)
+    scheduler = _scheduler(sheets)
+    payload, _ = store.load('grid', scheduler._snapshot_source())
+    store.save('grid', payload, datetime.datetime.now() - datetime.timedelta(days=30),
+               scheduler._snapshot_source())
+
+    sheets['Сетка Понедельник'][4][3] = 'новая активность'
+    spreadsheet = FakeSpreadsheet(sheets)
+    with contextlib.redirect_stdout(io.StringIO()):
+        restored = GridScheduler()
+        restored.spreadsheet = spreadsheet
+        assert restored.refresh()
+    assert spreadsheet.calls['values'] == 1
+    assert 'новая активность' in restored.get('Фамилия3')
+
+
+@pytest.mark.parametrize('document', [
+    [],
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': {'url': None}, 'payload': {}},
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': {'url': None}, 'timestamp': 'x',
+     'payload': {'days': {}}},
+    {'format': store.FORMAT_VERSION, 'kind': 'grid', 'source': {'url': None},
+     'timestamp': LOADED_AT.isoformat(), 'payload': {'days': ['четверг']}},
+])
+def test_grid_starts_with_corrupt_snapshot(snapshot_dir, document):
+    _write(snapshot_dir, 'grid', document)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scheduler = GridScheduler()
+        scheduler.spreadsheet = FakeSpreadsheet(make_grid(organisers=5, slots=4, days=2))
+        assert scheduler.refresh()
+    assert scheduler.get('Фамилия1').startswith('👤 Фамилия1 Милана')
+
+
+@pytest.fixture
+def calendar_refresher(monkeypatch):
+    def loader():
+        raise RuntimeError('нет подключения')
+
+    refresher = BackgroundRefresher(loader, min_interval=60, max_interval=3600, name='календарь-тест')
+    monkeypatch.setattr(calendar_module, '_REFRESHER', refresher)
+    monkeypatch.setattr(calendar_module, '_RESTORED', False)
+    yield refresher
+    refresher.close()
+
+
+def test_calendar_restores_saved_snapshot(calendar_refresher):
+    first = datetime.date(2026, 1, 5)
+    store.save('calendar', {
+        'events': {first.isoformat(): ['сбор', 'Альфа + Бета']},
+        'projects': {'альфа': [[first.isoformat(), 'Альфа + Бета']]},
+    }, LOADED_AT, calendar_module._snapshot_source())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        calendar_module.restore_snapshot()
+    data, timestamp = calendar_refresher.get()
+    assert timestamp == LOADED_AT
+    assert data.get_range(first, first + datetime.timedelta(days=1)) == [(first, ['Альфа + Бета', 'сбор'])]
+    assert data.get_range(first, first + datetime.timedelta(days=1), project='Альфа') == [
+        (first, ['Альфа + Бета'])
+    ]
+
+
+@pytest.mark.parametrize('payload', [[], {'events': {'не дата': []}, 'projects': {}}, {'events': {}}])
+def test_calendar_skips_corrupt_snapshot(calendar_refresher, payload):
+    store.save('calendar', payload, LOADED_AT, calendar_module._snapshot_source())
+    with contextlib.redirect_stdout(io.StringIO()):
+        calendar_module.restore_snapshot()
+        with pytest.raises(RuntimeError):
+            calendar_refresher.get()
+    assert calendar_module._RESTORED